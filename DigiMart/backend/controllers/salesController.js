@@ -3,19 +3,43 @@
 
 const BASE_URL = 'http://localhost:5001';
 const DEFAULT_TIMEOUT = 15000;
+const FORECAST_TIMEOUT = 30000;
+// Headroom left for the proxy when passing the forecast deadline on as a latency budget
+const FORECAST_BUDGET_MARGIN = 2000;
+
+// Last ETag and body per GET url, revalidated with If-None-Match
+const responseCache = new Map();
 
 // Utility functions
 const fetchWithTimeout = async (url, options = {}) => {
   const controller = new AbortController();
   const timeoutId = setTimeout(() => controller.abort(), options.timeout || DEFAULT_TIMEOUT);
-  
+  const isGet = !options.method || options.method === 'GET';
+  const cached = isGet ? responseCache.get(url) : undefined;
+
   try {
     const response = await fetch(url, {
       ...options,
       signal: controller.signal,
-      headers: { 'Content-Type': 'application/json', ...options.headers }
+      headers: {
+        'Content-Type': 'application/json',
+        ...(cached && { 'If-None-Match': cached.etag }),
+        ...options.headers
+      }
     });
     clearTimeout(timeoutId);
+
+    // Unchanged payload: replay the cached body as a normal 200
+    if (response.status === 304 && cached) {
+      const headers = new Headers(response.headers);
+      headers.set('Content-Type', 'application/json');
+      return new Response(cached.body, { status: 200, headers });
+    }
+
+    const etag = response.headers.get('etag');
+    if (isGet && response.ok && etag) {
+      responseCache.set(url, { etag, body: await response.clone().text() });
+    }
     return response;
   } catch (error) {
     clearTimeout(timeoutId);
@@ -72,8 +96,9 @@ const getSalesForecast = async (req, res) => {
       return res.status(400).json({ message: 'Invalid period. Must be: 7days, 15days' });
     }
     
-    const response = await fetchWithTimeout(`${BASE_URL}/api/sales/forecast?period=${period}`, {
-      timeout: 30000
+    const budget = FORECAST_TIMEOUT - FORECAST_BUDGET_MARGIN;
+    const response = await fetchWithTimeout(`${BASE_URL}/api/sales/forecast?period=${period}&budget_ms=${budget}`, {
+      timeout: FORECAST_TIMEOUT
     });
     
     if (!response.ok) {
@@ -90,6 +115,7 @@ const getSalesForecast = async (req, res) => {
     res.json({ 
       ...data, 
       serviceStatus: 'success', 
+      forecastTier: response.headers.get('x-forecast-tier'),
       timestamp: new Date().toISOString(), 
       period 
     });
@@ -1,33 +1,134 @@
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
+import glob
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from functools import lru_cache
 import warnings
 warnings.filterwarnings('ignore')
 
+
+def find_partitions(source):
+    """CSV partitions named by a directory or glob pattern, in sorted order"""
+    if os.path.isdir(source):
+        return sorted(glob.glob(os.path.join(source, '*.csv')))
+    return sorted(glob.glob(source))
+
+
+def is_partitioned(source):
+    """Whether the input names a set of partitions rather than a single file"""
+    return os.path.isdir(source) or glob.has_magic(source)
+
+
+def file_fingerprint(path, previous=None):
+    """Size/mtime of a file, plus its SHA-256 when size or mtime differ from the previous fingerprint"""
+    stat = os.stat(path)
+    fingerprint = {'size': stat.st_size, 'mtime': stat.st_mtime}
+    if previous and previous.get('size') == stat.st_size and previous.get('mtime') == stat.st_mtime:
+        fingerprint['sha256'] = previous.get('sha256')
+        return fingerprint
+    
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    fingerprint['sha256'] = digest.hexdigest()
+    return fingerprint
+
+
+def summarize_cleaned(df):
+    """Summary statistics of cleaned rows in a form that can be merged across partitions
+    
+    One aggregation over the rows by (date, category); daily, category and overall totals
+    are then read off that small table.
+    """
+    categories = df['Product_Type'] if 'Product_Type' in df.columns else pd.Series(np.nan, index=df.index)
+    cells = df.groupby([df['Date'], categories.rename('Product_Type')], sort=False, dropna=False)[
+        ['Revenue', 'Quantity']].sum()
+    
+    daily = cells.groupby(level='Date').sum()
+    by_category = cells['Revenue'].groupby(level='Product_Type').sum()
+    return {
+        'rows': int(len(df)),
+        'revenue': float(daily['Revenue'].sum()),
+        'quantity': float(daily['Quantity'].sum()),
+        'categories': {str(k): float(v) for k, v in by_category.items()},
+        'daily': {pd.Timestamp(d).strftime('%Y-%m-%d'): [float(r), float(q)]
+                  for d, r, q in zip(daily.index, daily['Revenue'], daily['Quantity'])}
+    }
+
+
+def merge_summaries(summaries):
+    """Combine partial summaries; days and categories spanning partitions are added together"""
+    merged = {'rows': 0, 'revenue': 0.0, 'quantity': 0.0, 'categories': {}, 'daily': {}}
+    for summary in summaries:
+        merged['rows'] += summary['rows']
+        merged['revenue'] += summary['revenue']
+        merged['quantity'] += summary['quantity']
+        for category, revenue in summary['categories'].items():
+            merged['categories'][category] = merged['categories'].get(category, 0.0) + revenue
+        for date, (revenue, quantity) in summary['daily'].items():
+            day = merged['daily'].setdefault(date, [0.0, 0.0])
+            day[0] += revenue
+            day[1] += quantity
+    return merged
+
+
+@lru_cache(maxsize=None)
+def date_resolution():
+    """Unit pandas gives datetime.date values converted back to timestamps, as create_forecasting_columns does"""
+    return pd.to_datetime(pd.Series([date(2000, 1, 1)])).dt.unit
+
+
+def _clean_partition(input_file, output_file, fused=True):
+    """Clean one partition into its own CSV and return its partial summary (runs in pool workers)"""
+    preprocessor = DataPreprocessor(input_file, output_file, verbose=False, fused=fused)
+    (preprocessor
+        .load_data()
+        .validate_required_columns()
+        .clean()
+        .select_final_columns()
+        .save_cleaned_data())
+    return summarize_cleaned(preprocessor.df)
+
+
 class DataPreprocessor:
     """
     Simplified data preprocessing that creates a single CSV with only forecasting-essential columns
     """
     
-    def __init__(self, input_file='data.csv', output_file='cleaned_customer_data.csv'):
+    def __init__(self, input_file='data.csv', output_file='cleaned_customer_data.csv', verbose=True, workers=None,
+                 fused=True):
         self.input_file = input_file
         self.output_file = output_file
+        self.verbose = verbose
+        self.fused = fused
+        self.workers = workers or os.cpu_count() or 1
         self.df = None
+        self.summary = None
         
+    def _log(self, message):
+        if self.verbose:
+            print(message)
+    
     def load_data(self):
         """Load raw data from CSV"""
-        print("Reading data...")
+        self._log("Reading data...")
         self.df = pd.read_csv(self.input_file)
-        print(f"Original data shape: {self.df.shape}")
-        print(f"Original columns: {list(self.df.columns)}")
+        self._log(f"Original data shape: {self.df.shape}")
+        self._log(f"Original columns: {list(self.df.columns)}")
         
         # Print column availability for key columns
         key_columns = ['Purchase Date', 'Order Status', 'Product Type', 
                       'Total Price', 'Quantity', 'Customer ID']
-        print("\nKey column availability:")
+        self._log("\nKey column availability:")
         for col in key_columns:
             status = "✓" if col in self.df.columns else "✗"
-            print(f"  {status} {col}")
+            self._log(f"  {status} {col}")
         
         return self
     
@@ -43,12 +144,12 @@ class DataPreprocessor:
     
     def clean_dates(self):
         """Clean and validate date columns"""
-        print("\nCleaning dates...")
+        self._log("\nCleaning dates...")
         self.df['Purchase Date'] = pd.to_datetime(self.df['Purchase Date'], errors='coerce')
         
         invalid_dates = self.df['Purchase Date'].isna().sum()
         if invalid_dates > 0:
-            print(f"  Removing {invalid_dates} rows with invalid dates")
+            self._log(f"  Removing {invalid_dates} rows with invalid dates")
             self.df = self.df.dropna(subset=['Purchase Date'])
         
         self.df = self.df.sort_values('Purchase Date').reset_index(drop=True)
@@ -56,7 +157,7 @@ class DataPreprocessor:
     
     def clean_numeric_columns(self):
         """Clean numeric columns"""
-        print("Cleaning numeric columns...")
+        self._log("Cleaning numeric columns...")
         
         for col in ['Total Price', 'Quantity']:
             if col in self.df.columns:
@@ -65,7 +166,7 @@ class DataPreprocessor:
                 self.df = self.df[self.df[col] >= 0]
                 removed = before - len(self.df)
                 if removed > 0:
-                    print(f"  Removed {removed} rows with invalid {col}")
+                    self._log(f"  Removed {removed} rows with invalid {col}")
         
         # Remove rows where quantity is 0
         self.df = self.df[self.df['Quantity'] > 0]
@@ -74,7 +175,7 @@ class DataPreprocessor:
     
     def clean_categorical_columns(self):
         """Clean categorical columns"""
-        print("Cleaning categorical columns...")
+        self._log("Cleaning categorical columns...")
         
         if 'Order Status' in self.df.columns:
             self.df['Order Status'] = self.df['Order Status'].str.strip().str.title()
@@ -86,16 +187,16 @@ class DataPreprocessor:
     
     def keep_completed_orders_only(self):
         """Keep only completed orders for forecasting"""
-        print("Filtering completed orders...")
+        self._log("Filtering completed orders...")
         before = len(self.df)
         self.df = self.df[self.df['Order Status'] == 'Completed'].copy()
         removed = before - len(self.df)
-        print(f"  Kept {len(self.df)} completed orders (removed {removed} non-completed)")
+        self._log(f"  Kept {len(self.df)} completed orders (removed {removed} non-completed)")
         return self
     
     def create_forecasting_columns(self):
         """Create only the columns needed for forecasting"""
-        print("Creating forecasting columns...")
+        self._log("Creating forecasting columns...")
         
         # Date (just the date part, no time)
         self.df['Date'] = self.df['Purchase Date'].dt.date
@@ -115,93 +216,235 @@ class DataPreprocessor:
         
         return self
     
+    def clean_fused(self):
+        """Run the date, numeric, categorical and status cleaning plus column creation in one pass
+        
+        Each check reads only its own column and narrows an array of row positions; the frame is
+        indexed once at the end. Rows, their order, dtypes and the per-stage log lines match the
+        step-by-step chain.
+        """
+        df = self.df
+        
+        self._log("\nCleaning dates...")
+        dates = pd.to_datetime(df['Purchase Date'], errors='coerce')
+        valid = dates.notna().to_numpy()
+        invalid_dates = len(df) - int(valid.sum())
+        if invalid_dates > 0:
+            self._log(f"  Removing {invalid_dates} rows with invalid dates")
+        # Sorted exactly like the chain's sort_values, so rows with equal timestamps come out in the same order
+        rows = np.flatnonzero(valid)
+        rows = rows[dates[valid].reset_index(drop=True).sort_values().index.to_numpy()]
+        
+        self._log("Cleaning numeric columns...")
+        numeric = {}
+        for col in ['Total Price', 'Quantity']:
+            # Converted over the rows still present at this stage, which decides the dtype
+            values = pd.to_numeric(df[col].iloc[rows], errors='coerce').to_numpy()
+            keep = values >= 0
+            removed = len(rows) - int(keep.sum())
+            if removed > 0:
+                self._log(f"  Removed {removed} rows with invalid {col}")
+            rows = rows[keep]
+            numeric = {name: column[keep] for name, column in numeric.items()}
+            numeric[col] = values[keep]
+        
+        # Remove rows where quantity is 0
+        keep = numeric['Quantity'] > 0
+        rows, numeric = rows[keep], {name: column[keep] for name, column in numeric.items()}
+        
+        self._log("Cleaning categorical columns...")
+        status = df['Order Status'].iloc[rows].str.strip().str.title()
+        
+        self._log("Filtering completed orders...")
+        keep = (status == 'Completed').to_numpy()
+        removed = len(rows) - int(keep.sum())
+        rows = rows[keep]
+        self._log(f"  Kept {len(rows)} completed orders (removed {removed} non-completed)")
+        
+        self._log("Creating forecasting columns...")
+        if 'Product Type' in df.columns:
+            product = df['Product Type'].iloc[rows].str.strip().str.title().to_numpy()
+        else:
+            product = 'Unknown'
+        
+        self.df = pd.DataFrame({
+            'Date': dates.iloc[rows].dt.normalize().dt.as_unit(date_resolution()).to_numpy(),
+            'Product_Type': product,
+            'Revenue': numeric['Total Price'][keep],
+            'Quantity': numeric['Quantity'][keep]
+        })
+        return self
+    
+    def clean(self):
+        """All cleaning stages, fused into one pass or as the step-by-step chain"""
+        if self.fused:
+            return self.clean_fused()
+        return (self
+            .clean_dates()
+            .clean_numeric_columns()
+            .clean_categorical_columns()
+            .keep_completed_orders_only()
+            .create_forecasting_columns())
+    
     def select_final_columns(self):
         """Select only the columns needed for forecasting"""
-        print("Selecting final columns...")
+        self._log("Selecting final columns...")
         
         # Essential columns for forecasting
         final_columns = ['Date', 'Product_Type', 'Revenue', 'Quantity']
         
-        self.df = self.df[final_columns].copy()
+        if list(self.df.columns) != final_columns:
+            self.df = self.df[final_columns].copy()
         
-        print(f"  Final columns: {list(self.df.columns)}")
-        print(f"  Final shape: {self.df.shape}")
+        self._log(f"  Final columns: {list(self.df.columns)}")
+        self._log(f"  Final shape: {self.df.shape}")
         
         return self
     
     def save_cleaned_data(self):
         """Save cleaned data to CSV"""
-        print(f"\nSaving cleaned data to: {self.output_file}")
+        self._log(f"\nSaving cleaned data to: {self.output_file}")
         self.df.to_csv(self.output_file, index=False)
-        print("✅ Data saved successfully")
+        self._log("✅ Data saved successfully")
         return self
     
     def generate_summary(self):
         """Generate summary of cleaned data"""
-        print("\n" + "="*70)
-        print("DATA PREPROCESSING SUMMARY")
-        print("="*70)
-        
-        print(f"\n📊 Dataset Overview:")
-        print(f"   Total rows: {len(self.df):,}")
-        print(f"   Date range: {self.df['Date'].min().strftime('%Y-%m-%d')} to {self.df['Date'].max().strftime('%Y-%m-%d')}")
-        print(f"   Time span: {(self.df['Date'].max() - self.df['Date'].min()).days} days")
-        print(f"   Unique dates: {self.df['Date'].nunique()}")
-        
-        print(f"\n💰 Revenue Stats:")
-        print(f"   Total revenue: ${self.df['Revenue'].sum():,.2f}")
-        print(f"   Average per transaction: ${self.df['Revenue'].mean():.2f}")
-        print(f"   Total units sold: {self.df['Quantity'].sum():,.0f}")
-        
-        if 'Product_Type' in self.df.columns:
-            print(f"\n🛍️  Product Categories:")
-            print(f"   Unique categories: {self.df['Product_Type'].nunique()}")
-            print("\n   Top 5 by revenue:")
-            top_products = self.df.groupby('Product_Type')['Revenue'].sum().sort_values(ascending=False).head(5)
-            for product, revenue in top_products.items():
-                print(f"   • {product}: ${revenue:,.2f}")
-        
-        print(f"\n📈 Daily Aggregates Preview:")
-        daily = self.df.groupby('Date').agg({
-            'Revenue': 'sum',
-            'Quantity': 'sum'
-        })
-        print(f"   Average daily revenue: ${daily['Revenue'].mean():,.2f}")
-        print(f"   Max daily revenue: ${daily['Revenue'].max():,.2f}")
-        print(f"   Average daily units: {daily['Quantity'].mean():.1f}")
-        
-        print("\n" + "="*70)
-        print("✅ Data is ready for forecasting!")
-        print("="*70)
+        if self.summary is None:
+            self.summary = summarize_cleaned(self.df)
+        summary = self.summary
+        dates = sorted(summary['daily'])
+        daily = np.array(list(summary['daily'].values())).reshape(-1, 2)
+        
+        self._log("\n" + "="*70)
+        self._log("DATA PREPROCESSING SUMMARY")
+        self._log("="*70)
+        
+        self._log(f"\n📊 Dataset Overview:")
+        self._log(f"   Total rows: {summary['rows']:,}")
+        self._log(f"   Date range: {dates[0]} to {dates[-1]}")
+        self._log(f"   Time span: {(pd.Timestamp(dates[-1]) - pd.Timestamp(dates[0])).days} days")
+        self._log(f"   Unique dates: {len(dates)}")
+        
+        self._log(f"\n💰 Revenue Stats:")
+        self._log(f"   Total revenue: ${summary['revenue']:,.2f}")
+        self._log(f"   Average per transaction: ${summary['revenue'] / summary['rows']:.2f}")
+        self._log(f"   Total units sold: {summary['quantity']:,.0f}")
+        
+        if summary['categories']:
+            self._log(f"\n🛍️  Product Categories:")
+            self._log(f"   Unique categories: {len(summary['categories'])}")
+            self._log("\n   Top 5 by revenue:")
+            top_products = sorted(summary['categories'].items(), key=lambda item: item[1], reverse=True)[:5]
+            for product, revenue in top_products:
+                self._log(f"   • {product}: ${revenue:,.2f}")
+        
+        self._log(f"\n📈 Daily Aggregates Preview:")
+        self._log(f"   Average daily revenue: ${daily[:, 0].mean():,.2f}")
+        self._log(f"   Max daily revenue: ${daily[:, 0].max():,.2f}")
+        self._log(f"   Average daily units: {daily[:, 1].mean():.1f}")
+        
+        self._log("\n" + "="*70)
+        self._log("✅ Data is ready for forecasting!")
+        self._log("="*70)
         
         return self
     
     def process_all(self):
         """Execute full preprocessing pipeline"""
-        print("="*70)
-        print("STARTING DATA PREPROCESSING")
-        print("="*70)
+        if is_partitioned(self.input_file):
+            return self.process_partitions()
+        
+        self._log("="*70)
+        self._log("STARTING DATA PREPROCESSING")
+        self._log("="*70)
         
         (self
             .load_data()
             .validate_required_columns()
-            .clean_dates()
-            .clean_numeric_columns()
-            .clean_categorical_columns()
-            .keep_completed_orders_only()
-            .create_forecasting_columns()
+            .clean()
             .select_final_columns()
             .save_cleaned_data()
             .generate_summary())
         
         return self
+    
+    def _partition_dir(self):
+        """Directory holding per-partition cleaned outputs and the manifest"""
+        return os.path.splitext(self.output_file)[0] + '_partitions'
+    
+    def process_partitions(self):
+        """Clean a directory or glob of partitions in parallel, skipping unchanged ones, then merge"""
+        self._log("="*70)
+        self._log("STARTING PARTITIONED DATA PREPROCESSING")
+        self._log("="*70)
+        
+        partitions = [os.path.abspath(path) for path in find_partitions(self.input_file)]
+        if not partitions:
+            raise FileNotFoundError(f"No partitions match '{self.input_file}'")
+        
+        partition_dir = self._partition_dir()
+        manifest_file = os.path.join(partition_dir, 'manifest.json')
+        os.makedirs(partition_dir, exist_ok=True)
+        manifest = {}
+        if os.path.exists(manifest_file):
+            with open(manifest_file) as f:
+                manifest = json.load(f)
+        
+        # A partition is reused when its size/mtime match, or its content hash does
+        entries, pending = {}, []
+        for path in partitions:
+            previous = manifest.get(path)
+            fingerprint = file_fingerprint(path, previous)
+            name = f"{os.path.splitext(os.path.basename(path))[0]}-{hashlib.sha1(path.encode()).hexdigest()[:8]}.csv"
+            output = os.path.join(partition_dir, name)
+            if (previous and previous.get('sha256') == fingerprint['sha256']
+                    and 'summary' in previous and os.path.exists(output)):
+                entries[path] = {**previous, **fingerprint, 'output': output}
+            else:
+                entries[path] = {**fingerprint, 'output': output}
+                pending.append(path)
+        
+        self._log(f"\nPartitions: {len(partitions)} found, {len(partitions) - len(pending)} unchanged, "
+                  f"{len(pending)} to clean")
+        
+        try:
+            outputs = [entries[path]['output'] for path in pending]
+            if len(pending) > 1 and self.workers > 1:
+                with ProcessPoolExecutor(max_workers=min(self.workers, len(pending))) as pool:
+                    for path, summary in zip(pending, pool.map(_clean_partition, pending, outputs,
+                                                                  [self.fused] * len(pending))):
+                        entries[path]['summary'] = summary
+                        self._log(f"  Cleaned {os.path.basename(path)}: {summary['rows']:,} rows")
+            else:
+                for path, output in zip(pending, outputs):
+                    entries[path]['summary'] = _clean_partition(path, output, self.fused)
+                    self._log(f"  Cleaned {os.path.basename(path)}: {entries[path]['summary']['rows']:,} rows")
+        finally:
+            # Record whatever finished so a rerun after a failure only redoes the rest
+            with open(manifest_file, 'w') as f:
+                json.dump({path: entry for path, entry in entries.items() if 'summary' in entry}, f, indent=1)
+        
+        # Outputs of partitions that no longer exist are removed
+        for path, entry in manifest.items():
+            if path not in entries and os.path.exists(entry.get('output', '')):
+                os.remove(entry['output'])
+        
+        self._log("\nMerging partitions...")
+        frames = [pd.read_csv(entries[path]['output'], parse_dates=['Date']) for path in partitions]
+        self.df = pd.concat(frames, ignore_index=True).sort_values('Date', kind='stable').reset_index(drop=True)
+        self.summary = merge_summaries(entries[path]['summary'] for path in partitions)
+        
+        self.save_cleaned_data().generate_summary()
+        return self
 
 
 if __name__ == "__main__":
     try:
         # Initialize preprocessor
+        # A directory or glob of partitions may be given instead of data.csv
         preprocessor = DataPreprocessor(
-            input_file='data.csv',
+            input_file=sys.argv[1] if len(sys.argv) > 1 else 'data.csv',
             output_file='cleaned_customer_data.csv'
         )
         
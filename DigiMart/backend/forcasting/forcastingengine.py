@@ -1,25 +1,133 @@
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
+import copy
+import json
+import multiprocessing
+import os
+import gzip
+import hashlib
+import weakref
+import pickle
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing.shared_memory import SharedMemory
+from datetime import datetime, timezone
+from functools import lru_cache
 import warnings
 warnings.filterwarnings('ignore')
 
-from flask import Flask, request, jsonify
+from flask import Flask, request, Response
+from scipy.signal import lfilter
 from flask_cors import CORS
-from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import mean_absolute_error, mean_absolute_percentage_error
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def _json_default(obj):
+    """Fallback conversion for NumPy/pandas values the encoder cannot handle natively"""
+    if isinstance(obj, np.bool_):
+        return bool(obj)
+    if isinstance(obj, np.integer):
+        return int(obj)
+    if isinstance(obj, np.floating):
+        return float(obj)
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, (pd.Timestamp, datetime)):
+        return obj.strftime('%Y-%m-%d')
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def encode_json(payload):
+    """Serialize a response payload to UTF-8 JSON bytes (orjson when available)"""
+    if orjson is not None:
+        return orjson.dumps(payload, default=_json_default,
+                            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(payload, default=_json_default, separators=(',', ':')).encode('utf-8')
+
+
+# Supported series resolutions: pandas frequency of the period starts, seasonal period (and the
+# fallback used when the history holds fewer than two full cycles), label format, horizons and
+# the average period length in days, used to convert day lookbacks
+GRANULARITIES = {
+    'daily': {'freq': 'D', 'season': 7, 'short_season': 7, 'label': '%A', 'unit': 'days',
+              'horizons': {'7days': 7, '15days': 15}, 'days': 1},
+    'weekly': {'freq': 'W-MON', 'season': 52, 'short_season': 4, 'label': 'Week of %b %d', 'unit': 'weeks',
+               'horizons': {'4weeks': 4, '13weeks': 13, '26weeks': 26}, 'days': 7},
+    'monthly': {'freq': 'MS', 'season': 12, 'short_season': 3, 'label': '%B %Y', 'unit': 'months',
+                'horizons': {'3months': 3, '6months': 6, '12months': 12}, 'days': 30.4375},
+}
+
+
+def _period_index(days, granularity):
+    """Absolute period number of each epoch day (Monday-based weeks, calendar months)"""
+    if granularity == 'weekly':
+        # Day 0 of the Unix epoch was a Thursday, so weeks roll over on day -3 + 7k
+        return (days + 3) // 7
+    if granularity == 'monthly':
+        return days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+    return days
+
+
+def _period_start(index, granularity):
+    """Epoch day on which an absolute period number starts"""
+    if granularity == 'weekly':
+        return int(index) * 7 - 3
+    if granularity == 'monthly':
+        return int(np.datetime64(int(index), 'M').astype('datetime64[D]').astype(np.int64))
+    return int(index)
+
+
+@lru_cache(maxsize=64)
+def _future_calendar(last_date, steps, granularity='daily'):
+    """Date labels for the forecast horizon, formatted once per range and reused"""
+    spec = GRANULARITIES[granularity]
+    dates = pd.date_range(last_date, periods=steps + 1, freq=spec['freq'])[1:]
+    weekend = np.asarray(dates.weekday >= 5) & (granularity == 'daily')
+    weekend.flags.writeable = False
+    return {
+        'date': tuple(dates.strftime('%Y-%m-%d')),
+        'day_name': tuple(dates.strftime(spec['label'])),
+        'is_weekend': tuple(weekend.tolist()),
+        'weekend_mask': weekend
+    }
+
+
 class EnhancedARIMAModel:
     """Optimized ARIMA implementation for time series forecasting"""
     
-    def __init__(self, p=1, d=1, q=1):
+    # Only the state needed to forecast is kept after fitting; original_data is
+    # a reference to the caller's series (a view into the engine cube), not a copy
+    __slots__ = ('p', 'd', 'q', 'period', 'params_ar', 'params_ma', 'mean', 'original_data', 'n_obs',
+                 'loc', 'scale', 'trend_last', 'seasonal_profile', 'level_anchor',
+                 'diff_tail', 'resid_tail', 'resid_count', 'resid_var', 'resid_pool')
+    
+    def __init__(self, p=1, d=1, q=1, period=7):
         self.p, self.d, self.q = p, d, q
-        self.params_ar = self.params_ma = self.residuals = None
-        self.original_data = self.preprocessed_data = None
+        self.period = period
+        self.params_ar = self.params_ma = None
+        self.original_data = None
+        self.n_obs = 0
         self.mean = 0
-        self.fitted_values = None
-        self.scaler = StandardScaler()
-        self.trend = self.seasonal = None
+        self.loc, self.scale = 0.0, 1.0
+        self.trend_last = 0.0
+        self.seasonal_profile = self.level_anchor = None
+        self.diff_tail = self.resid_tail = None
+        self.resid_count, self.resid_var = 0, 0.0
+        self.resid_pool = None
         
     def preprocess_data(self, data):
         """Preprocessing with trend and seasonal decomposition"""
@@ -27,7 +135,7 @@ class EnhancedARIMAModel:
         if np.all(data > 0):
             data = np.log1p(data)
         
-        n, period = len(data), 7
+        n, period = len(data), self.period
         
         # Efficient trend calculation
         if n >= period * 2:
@@ -46,12 +154,17 @@ class EnhancedARIMAModel:
                 indices = np.arange(i, n, period)
                 seasonal[indices] = np.mean(detrended[indices])
         
-        self.trend, self.seasonal = trend, seasonal
+        # The seasonal component repeats every period, so its first cycle is all forecasting needs
+        self.trend_last = float(trend[-1]) if n > 0 else 0.0
+        self.seasonal_profile = seasonal[:period].copy()
         residual = data - trend - seasonal
-        return self.scaler.fit_transform(residual.reshape(-1, 1)).flatten()
+        self.loc = float(np.mean(residual))
+        std = float(np.std(residual))
+        self.scale = std if std > 0 else 1.0
+        return (residual - self.loc) / self.scale
     
     def autocorrelation(self, data, max_lag):
-        """Vectorized autocorrelation calculation"""
+        """Autocorrelation up to max_lag from one FFT of the zero-padded series"""
         n = len(data)
         if n < 2:
             return np.array([1.0] + [0.0] * max_lag)
@@ -62,21 +175,42 @@ class EnhancedARIMAModel:
         if c0 == 0:
             return np.array([1.0] + [0.0] * max_lag)
         
-        autocorr = np.ones(max_lag + 1)
-        for lag in range(1, min(max_lag + 1, n)):
-            autocorr[lag] = np.sum(data[:-lag] * data[lag:]) / (n * c0)
+        # Padding to twice the length keeps the circular correlation from wrapping
+        size = 1 << (2 * n - 1).bit_length()
+        spectrum = np.fft.rfft(data, size)
+        acov = np.fft.irfft(spectrum.real ** 2 + spectrum.imag ** 2, size)
         
+        # Lags beyond the series length are left at 1 as before
+        autocorr = np.ones(max_lag + 1)
+        lags = min(max_lag + 1, n)
+        autocorr[1:lags] = acov[1:lags] / (n * c0)
         return autocorr
     
+    @staticmethod
+    def levinson_durbin(autocorr, p, ridge=1e-6):
+        """Solve the Yule-Walker equations for AR(p) in O(p^2) by the Levinson-Durbin recursion
+        
+        The ridge is added to the lag-0 term, like a diagonal load on the Toeplitz matrix.
+        Raises LinAlgError when the autocorrelations are not positive definite.
+        """
+        phi = np.zeros(p)
+        error = autocorr[0] + ridge
+        for k in range(p):
+            reflection = (autocorr[k + 1] - phi[:k] @ autocorr[k:0:-1]) / error
+            phi[:k] = phi[:k] - reflection * phi[:k][::-1]
+            phi[k] = reflection
+            error *= 1.0 - reflection ** 2
+            if error <= 0:
+                raise np.linalg.LinAlgError('autocorrelations are not positive definite')
+        return phi
+    
     def estimate_params(self, data, p, q):
         """Estimate AR and MA parameters"""
         params_ar = np.array([])
         if p > 0:
             autocorr = self.autocorrelation(data, p)
-            R = np.array([[autocorr[abs(i - j)] for j in range(p)] for i in range(p)])
-            R += 1e-6 * np.eye(p)
             try:
-                params_ar = np.clip(np.linalg.solve(R, autocorr[1:p+1]), -0.95, 0.95)
+                params_ar = np.clip(self.levinson_durbin(autocorr, p), -0.95, 0.95)
             except:
                 params_ar = np.linspace(0.3, 0.3 * p, p) / p
         
@@ -93,25 +227,23 @@ class EnhancedARIMAModel:
         if len(ar_params) == 0:
             return data
         
-        residuals = np.zeros(len(data))
+        # data[t] - sum(ar[i] * data[t-1-i]) as one FIR filter; the first p outputs lack full history
         p = len(ar_params)
-        for t in range(p, len(data)):
-            ar_term = np.dot(ar_params, data[t-p:t][::-1])
-            residuals[t] = data[t] - ar_term
-        return residuals[p:]
+        return lfilter(np.concatenate(([1.0], -ar_params)), [1.0], data)[p:]
     
     def fit(self, data):
         """Fit ARIMA model"""
-        self.original_data = np.array(data, dtype=float)
-        if len(self.original_data) < 10:
-            self.mean = np.mean(self.original_data)
-            self.fitted_values = np.full_like(self.original_data, self.mean)
+        self.original_data = np.asarray(data)
+        values = np.asarray(data, dtype=float)
+        self.n_obs = len(values)
+        if len(values) < 10:
+            self.mean = float(np.mean(values)) if len(values) > 0 else 0.0
             return self
         
-        self.preprocessed_data = self.preprocess_data(self.original_data)
+        preprocessed = self.preprocess_data(values)
         
         # Differencing
-        differenced = self.preprocessed_data.copy()
+        differenced = preprocessed
         for _ in range(self.d):
             if len(differenced) > 1:
                 differenced = np.diff(differenced)
@@ -124,51 +256,33 @@ class EnhancedARIMAModel:
         
         # Parameter estimation
         self.params_ar, self.params_ma = self.estimate_params(centered, self.p, self.q)
-        fitted = self._calculate_fitted_values(differenced)
-        self.residuals = differenced - fitted
-        
-        # Inverse transform
-        for _ in range(self.d):
-            fitted = np.cumsum(np.concatenate([[self.preprocessed_data[-self.d]], fitted]))
-        
-        fitted_scaled = self.scaler.inverse_transform(fitted.reshape(-1, 1)).flatten()
-        min_len = min(len(fitted_scaled), len(self.trend), len(self.seasonal))
+        residuals = differenced - self._calculate_fitted_values(differenced)
         
-        self.fitted_values = np.zeros(len(self.original_data))
-        self.fitted_values[:min_len] = fitted_scaled[:min_len] + self.trend[:min_len] + self.seasonal[:min_len]
-        self.fitted_values[min_len:] = np.mean(self.fitted_values[:min_len])
-        self.fitted_values = np.maximum(np.expm1(self.fitted_values), 0)
+        # Keep only the tails the recursions read, plus the residual moments for AIC
+        self.level_anchor = float(preprocessed[-self.d]) if self.d > 0 else 0.0
+        self.diff_tail = differenced[-max(self.p, 1):].copy()
+        self.resid_tail = residuals[-max(self.q, 1):].copy()
+        self.resid_count, self.resid_var = len(residuals), float(np.var(residuals))
+        # Centered residuals are the bootstrap pool for prediction intervals
+        self.resid_pool = (residuals - np.mean(residuals)).astype(np.float32)
         
         return self
     
     def _calculate_fitted_values(self, data):
         """Calculate fitted values from ARIMA model"""
-        n = len(data)
-        fitted = np.zeros(n)
-        residuals = np.zeros(n)
-        
-        for t in range(n):
-            ar_term = sum(self.params_ar[i] * (data[t-i-1] - self.mean) 
-                         for i in range(min(self.p, t)) if i < len(self.params_ar))
-            ma_term = sum(self.params_ma[i] * residuals[t-i-1] 
-                         for i in range(min(self.q, t)) if i < len(self.params_ma))
-            fitted[t] = self.mean + ar_term + ma_term
-            residuals[t] = data[t] - fitted[t]
-        
-        return fitted
+        # The one-step residuals e[t] = y[t] - sum(ar * y[t-1-i]) - sum(ma * e[t-1-i]) of the
+        # centered series are an IIR filter with zero pre-sample values
+        data = np.asarray(data, dtype=float)
+        ar = np.asarray(self.params_ar[:self.p], dtype=float)
+        ma = np.asarray(self.params_ma[:self.q], dtype=float)
+        residuals = lfilter(np.concatenate(([1.0], -ar)), np.concatenate(([1.0], ma)), data - self.mean)
+        return data - residuals
     
-    def forecast(self, steps=1):
-        """Generate forecasts"""
-        if self.preprocessed_data is None or len(self.preprocessed_data) == 0:
-            return np.full(steps, np.mean(self.original_data) if len(self.original_data) > 0 else 0)
-        
-        differenced = self.preprocessed_data.copy()
-        for _ in range(self.d):
-            differenced = np.diff(differenced)
-        
+    def _forecast_differenced(self, steps):
+        """Point forecast of the differenced, scaled series"""
         forecasts = []
-        last_values = list(differenced)
-        last_residuals = list(self.residuals) if self.residuals is not None else [0] * len(differenced)
+        last_values = list(self.diff_tail)
+        last_residuals = list(self.resid_tail)
         
         for step in range(steps):
             ar_term = sum(self.params_ar[i] * (last_values[-(i+1)] - self.mean) 
@@ -181,23 +295,51 @@ class EnhancedARIMAModel:
             last_values.append(forecast)
             last_residuals.append(0)
         
-        forecasts = np.array(forecasts)
+        return np.array(forecasts)
+    
+    def _to_levels(self, differenced):
+        """Undo differencing, scaling and decomposition along the last axis"""
+        steps = differenced.shape[-1]
+        forecasts = differenced
         
         # Inverse differencing
         for _ in range(self.d):
-            forecasts = np.cumsum(np.concatenate([[self.preprocessed_data[-self.d]], forecasts]))
+            anchor = np.full(forecasts.shape[:-1] + (1,), self.level_anchor)
+            forecasts = np.cumsum(np.concatenate([anchor, forecasts], axis=-1), axis=-1)
         
-        forecasts = self.scaler.inverse_transform(forecasts.reshape(-1, 1)).flatten()
+        forecasts = forecasts * self.scale + self.loc
         
         # Add trend and seasonal
-        for i in range(steps):
-            trend_val = self.trend[-1] if len(self.trend) > 0 else 0
-            seasonal_idx = (len(self.seasonal) + i) % 7
-            seasonal_val = self.seasonal[seasonal_idx] if seasonal_idx < len(self.seasonal) else 0
-            forecasts[i] += trend_val + seasonal_val
+        profile = self.seasonal_profile
+        phases = (self.n_obs + np.arange(steps)) % self.period
+        seasonal = np.where(phases < len(profile), profile[np.minimum(phases, len(profile) - 1)], 0)
+        forecasts[..., :steps] += self.trend_last + seasonal
         
         return np.maximum(np.expm1(forecasts), 0)
     
+    def _impulse_response(self, steps):
+        """MA(infinity) weights of the fitted ARMA recursion for the first steps horizons"""
+        psi = np.zeros(steps)
+        psi[0] = 1.0
+        for k in range(1, steps):
+            ar = sum(self.params_ar[i] * psi[k-i-1] for i in range(min(len(self.params_ar), k)))
+            psi[k] = ar + (self.params_ma[k-1] if k <= len(self.params_ma) else 0.0)
+        return psi
+    
+    def forecast(self, steps=1):
+        """Generate forecasts"""
+        if self.diff_tail is None:
+            return np.full(steps, self.mean if self.n_obs > 0 else 0)
+        return self._to_levels(self._forecast_differenced(steps))
+    
+    def simulate(self, steps, n_paths=2000, seed=0):
+        """Residual-bootstrap sample paths, shape (n_paths, steps)"""
+        return simulate_paths([self], steps, n_paths=n_paths, seed=seed)[0]
+    
+    def forecast_quantiles(self, steps, quantiles=(0.1, 0.5, 0.9), n_paths=2000, seed=0):
+        """Per-step forecast quantiles, shape (len(quantiles), steps)"""
+        return np.quantile(self.simulate(steps, n_paths, seed), quantiles, axis=0)
+    
     def calculate_metrics(self, forecast_period=7):
         """Calculate model performance metrics using MAPE instead of R²"""
         if self.original_data is None or len(self.original_data) < 20:
@@ -216,10 +358,10 @@ class EnhancedARIMAModel:
             
             # Split data
             train_data = self.original_data[:train_size]
-            test_data = self.original_data[train_size:]
+            test_data = np.asarray(self.original_data[train_size:], dtype=float)
             
             # Train a temporary model on training data only
-            temp_model = EnhancedARIMAModel(self.p, self.d, self.q)
+            temp_model = EnhancedARIMAModel(self.p, self.d, self.q, self.period)
             temp_model.fit(train_data)
             
             # Forecast for the test period
@@ -254,124 +396,645 @@ class EnhancedARIMAModel:
     
     def calculate_aic(self):
         """Calculate AIC"""
-        if self.residuals is None or len(self.residuals) == 0:
+        if self.resid_count == 0:
             return float('inf')
-        n, k = len(self.residuals), self.p + self.q + 1
+        n, k = self.resid_count, self.p + self.q + 1
         if n <= k:
             return float('inf')
-        var = np.var(self.residuals)
+        var = self.resid_var
         return n * np.log(var) + 2 * k if var > 0 else float('inf')
 
 
+def _smooth3(values):
+    """Centered 3-point rolling mean along the last axis (pandas min_periods=1 edges)"""
+    n = values.shape[-1]
+    padded = np.zeros(values.shape[:-1] + (n + 2,))
+    padded[..., 1:-1] = values
+    counts = np.full(n, 3.0)
+    counts[0] -= 1
+    counts[-1] -= 1
+    if n == 1:
+        counts[:] = 1.0
+    return (padded[..., :-2] + padded[..., 1:-1] + padded[..., 2:]) / counts
+
+
+def simulate_paths(models, steps, n_paths=2000, chunk_size=500, seed=0):
+    """Residual-bootstrap sample paths for several fitted models at once
+    
+    Shocks for every model, path and horizon step are drawn in one array and pushed
+    through each model's impulse response with a single batched product, so the cost
+    does not grow with a Python loop over paths. Paths are generated in chunks of
+    chunk_size to bound the temporaries. Returns float32 of shape (models, n_paths, steps).
+    """
+    rng = np.random.default_rng(seed)
+    paths = np.empty((len(models), n_paths, steps), dtype=np.float32)
+    
+    fitted = [i for i, m in enumerate(models) if m.diff_tail is not None and m.resid_pool is not None and len(m.resid_pool) > 0]
+    for i, model in enumerate(models):
+        if i not in fitted:
+            # Too little history to fit: no residuals to resample, the forecast is the interval
+            paths[i] = model.forecast(steps)[:steps]
+    if not fitted:
+        return paths
+    
+    fitted_models = [models[i] for i in fitted]
+    point = np.stack([m._forecast_differenced(steps) for m in fitted_models])
+    
+    # Lower-triangular Toeplitz propagation matrices: effect of the shock at step j on step k
+    lags = np.arange(steps)[None, :] - np.arange(steps)[:, None]
+    propagate = np.stack([np.where(lags >= 0, m._impulse_response(steps)[np.maximum(lags, 0)], 0.0)
+                          for m in fitted_models])
+    
+    # Residual pools padded into one matrix so a single gather draws every shock
+    pool_sizes = np.array([len(m.resid_pool) for m in fitted_models])
+    pools = np.zeros((len(fitted_models), pool_sizes.max()), dtype=np.float32)
+    for row, model in enumerate(fitted_models):
+        pools[row, :pool_sizes[row]] = model.resid_pool
+    rows = np.arange(len(fitted_models))[:, None, None]
+    
+    for start in range(0, n_paths, chunk_size):
+        stop = min(start + chunk_size, n_paths)
+        draws = (rng.random((len(fitted_models), stop - start, steps)) * pool_sizes[:, None, None]).astype(np.int64)
+        shocks = pools[rows, draws]
+        differenced = point[:, None, :] + np.einsum('cpj,cjk->cpk', shocks, propagate)
+        for row, i in enumerate(fitted):
+            paths[i, start:stop] = fitted_models[row]._to_levels(differenced[row])[:, :steps]
+    
+    return paths
+
+
+# AR orders spanning whole seasonal cycles can join the full search, e.g. FORECAST_SEASONAL_AR_CYCLES=1,2,4
+# for lags up to 7, 14 and 28 on daily data; Levinson-Durbin keeps these long AR fits cheap. Off by
+# default: AIC favours them in-sample, but they did not beat the small grid in rolling backtests
+SEASONAL_AR_CYCLES = tuple(int(c) for c in os.environ.get('FORECAST_SEASONAL_AR_CYCLES', '').split(',') if c)
+
+
+def seasonal_ar_orders(season):
+    return tuple(season * cycles for cycles in SEASONAL_AR_CYCLES)
+
+
+def _order_axes(max_p, max_d, max_q, seasonal_p):
+    return sorted(set(range(max_p + 1)) | set(seasonal_p)), list(range(max_d + 1)), list(range(max_q + 1))
+
+
+def arima_grid(max_p=2, max_d=1, max_q=2, seasonal_p=()):
+    """Candidate (p, d, q) orders of the full search"""
+    ps, ds, qs = _order_axes(max_p, max_d, max_q, seasonal_p)
+    return [(p, d, q) for p in ps for d in ds for q in qs if p + q > 0]
+
+
+def order_neighbourhood(order, max_p=2, max_d=1, max_q=2, seasonal_p=()):
+    """An order and the grid orders one candidate value away from it in a single term"""
+    axes = _order_axes(max_p, max_d, max_q, seasonal_p)
+    grid = set(arima_grid(max_p, max_d, max_q, seasonal_p))
+    candidates = [tuple(order)]
+    for i, values in enumerate(axes):
+        if order[i] not in values:
+            continue
+        position = values.index(order[i])
+        for step in (-1, 1):
+            if 0 <= position + step < len(values):
+                neighbour = list(order)
+                neighbour[i] = values[position + step]
+                if tuple(neighbour) in grid:
+                    candidates.append(tuple(neighbour))
+    return candidates
+
+
+def best_order(series, season, orders):
+    """Lowest-AIC order among the candidates as (order, aic); ((1, 1, 1), inf) when none fits"""
+    best_aic, best_params = float('inf'), (1, 1, 1)
+    for p, d, q in orders:
+        if len(series) > p + d + q + 10:
+            try:
+                model = EnhancedARIMAModel(p, d, q, period=season)
+                model.fit(series)
+                aic = model.calculate_aic()
+                if aic < best_aic:
+                    best_aic, best_params = aic, (p, d, q)
+            except:
+                continue
+    return best_params, best_aic
+
+
+def find_best_arima_params(series, season=7, max_p=2, max_d=1, max_q=2, seasonal_p=()):
+    """Find optimal ARIMA parameters by AIC over a small grid"""
+    if len(series) < 15:
+        return (1, 1, 1)
+    return best_order(series, season, arima_grid(max_p, max_d, max_q, seasonal_p))[0]
+
+
+# Warm-started order selection: a retrain first tries the incumbent order and its neighbours and
+# only reruns the full grid when per-observation AIC worsens by more than the tolerance, or when
+# the last full search is older than FORECAST_FULL_SEARCH_DAYS
+ORDER_STORE_FILE = os.environ.get('FORECAST_ORDER_STORE', 'arima_orders.json')
+WARM_START_TOLERANCE = float(os.environ.get('FORECAST_WARM_START_TOLERANCE', 0.05))
+FULL_SEARCH_DAYS = float(os.environ.get('FORECAST_FULL_SEARCH_DAYS', 7))
+
+
+class OrderStore:
+    """Selected order, AIC and data fingerprint per series, persisted as JSON across retrains and restarts"""
+    
+    def __init__(self, path=ORDER_STORE_FILE):
+        self.path = path
+        self.entries = None
+        self._lock = threading.Lock()
+    
+    def _load(self):
+        if self.entries is None:
+            self.entries = {}
+            if os.path.exists(self.path):
+                try:
+                    with open(self.path) as f:
+                        self.entries = json.load(f)
+                except (OSError, ValueError) as e:
+                    print(f"Ignoring unreadable order store {self.path}: {e}")
+        return self.entries
+    
+    def get(self, key):
+        with self._lock:
+            return self._load().get(key)
+    
+    def put(self, key, entry):
+        with self._lock:
+            self._load()[key] = entry
+            try:
+                tmp = self.path + '.tmp'
+                with open(tmp, 'w') as f:
+                    json.dump(self.entries, f, indent=1)
+                os.replace(tmp, self.path)
+            except OSError as e:
+                print(f"Could not save order store {self.path}: {e}")
+
+
+order_store = OrderStore()
+
+
+def select_order(key, series, season, store=None, max_p=2, max_d=1, max_q=2, seasonal_p=(), now=None):
+    """Order for a series, warm-started from the stored incumbent; returns (order, how) with how
+    one of 'reused' (data unchanged), 'warm' (neighbourhood accepted) or 'full' (grid searched)"""
+    store = store if store is not None else order_store
+    if len(series) < 15:
+        return (1, 1, 1), 'full'
+    
+    now = time.time() if now is None else now
+    grid = [max_p, max_d, max_q, *seasonal_p]
+    fingerprint = hashlib.sha1(np.ascontiguousarray(series, dtype=np.float32).tobytes()).hexdigest()
+    entry = store.get(key)
+    if entry is not None and entry.get('grid') != grid:
+        entry = None
+    
+    if entry is not None and entry['fingerprint'] == fingerprint:
+        return tuple(entry['order']), 'reused'
+    
+    how = 'full'
+    if entry is not None and now - entry['full_search_at'] < FULL_SEARCH_DAYS * 86400:
+        order, aic = best_order(series, season, order_neighbourhood(entry['order'], max_p, max_d, max_q, seasonal_p))
+        if aic / len(series) <= entry['aic_per_obs'] + WARM_START_TOLERANCE:
+            how = 'warm'
+    if how == 'full':
+        order, aic = best_order(series, season, arima_grid(max_p, max_d, max_q, seasonal_p))
+    
+    if np.isfinite(aic):
+        store.put(key, {
+            'order': list(order), 'aic_per_obs': aic / len(series), 'fingerprint': fingerprint, 'grid': grid,
+            'full_search_at': now if how == 'full' else entry['full_search_at']
+        })
+    return order, how
+
+
+# Trailing window, in days, of the average unit price applied to forecast quantities
+RECENT_PRICE_DAYS = 14
+
+
+def category_job(series, order, train_size, steps, season, validate, recent=RECENT_PRICE_DAYS):
+    """Fit, optionally validate, and forecast one category from its (field, period) block
+    
+    Pure function over NumPy arrays so it can run in a pool worker. order is the
+    category's selected (p, d, q) or None to search it on the training slice, and recent
+    the number of trailing periods whose average unit price prices the forecast.
+    """
+    quantity = series[QUANTITY_SMOOTHED]
+    if len(quantity) < 15 or series[QUANTITY].sum(dtype=float) == 0:
+        return {'status': 'skipped', 'reason': 'insufficient sales history'}
+    
+    train_size = min(train_size, len(quantity))
+    if train_size < 10:
+        return {'status': 'skipped', 'reason': 'training window too short'}
+    
+    if order is None:
+        order = find_best_arima_params(quantity[:train_size], season, max_p=1, max_d=1, max_q=1)
+    
+    mape = None
+    if validate:
+        temp_model = EnhancedARIMAModel(*order, period=season)
+        temp_model.fit(quantity[:train_size])
+        mape = temp_model.calculate_metrics(min(len(quantity) - train_size, steps))['mape']
+        # Skip categories with MAPE > 300%
+        if mape > 300:
+            return {'status': 'skipped', 'reason': f'validation MAPE {mape:.0f}% above 300%'}
+    
+    model = EnhancedARIMAModel(*order, period=season)
+    model.fit(quantity)
+    
+    recent_revenue = float(series[REVENUE, -recent:].sum(dtype=float))
+    recent_quantity = float(series[QUANTITY, -recent:].sum(dtype=float))
+    
+    return {
+        'status': 'ok',
+        'order': order,
+        'mape': mape,
+        'forecast': model.forecast(steps),
+        'model': model,
+        'recent_revenue': recent_revenue,
+        'recent_quantity': recent_quantity,
+        'history_quantity': float(series[QUANTITY, -steps:].sum(dtype=float))
+    }
+
+
+# Category jobs go to a process pool once there are enough categories to pay for dispatch. The pool
+# is created lazily from a process that already runs request and watcher threads, so workers are
+# started from a clean server process instead of forked mid-flight with other threads' locks held
+FORECAST_WORKERS = int(os.environ.get('FORECAST_WORKERS') or os.cpu_count() or 1)
+PARALLEL_MIN_CATEGORIES = 4
+POOL_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+_worker_pool = None
+_worker_pool_lock = threading.Lock()
+_attached_cubes = {}
+
+
+def get_worker_pool():
+    """Shared process pool for category jobs (None when running single-process)"""
+    global _worker_pool
+    with _worker_pool_lock:
+        if _worker_pool is None and FORECAST_WORKERS > 1:
+            context = multiprocessing.get_context(POOL_START_METHOD)
+            if POOL_START_METHOD == 'forkserver':
+                # The server imports this module once, so workers fork with NumPy/pandas loaded
+                context.set_forkserver_preload([__name__])
+            _worker_pool = ProcessPoolExecutor(max_workers=FORECAST_WORKERS, mp_context=context)
+        return _worker_pool
+
+
+def discard_worker_pool(pool):
+    """Drop a broken pool so the next get_worker_pool() starts a fresh one"""
+    global _worker_pool
+    with _worker_pool_lock:
+        if _worker_pool is pool:
+            _worker_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _attach_cube(name, shape):
+    """Map an engine cube published in shared memory, once per worker process"""
+    if name not in _attached_cubes:
+        # Retrains publish new cubes; drop mappings of old ones
+        while len(_attached_cubes) >= 8:
+            shm, _ = _attached_cubes.pop(next(iter(_attached_cubes)))
+            try:
+                shm.close()
+            except BufferError:
+                pass
+        shm = SharedMemory(name=name)
+        _attached_cubes[name] = (shm, np.ndarray(shape, dtype=np.float32, buffer=shm.buf))
+    return _attached_cubes[name][1]
+
+
+def _report_error(errors, category, reason):
+    entry = {'category': category, 'error': reason}
+    if entry not in errors:
+        errors.append(entry)
+
+
+def _unlink_shared(shm):
+    try:
+        shm.unlink()
+    except FileNotFoundError:
+        pass
+
+
+def _run_category_job(cube, row, job, task=category_job):
+    """Resolve an entity block from an in-process cube or a shared-memory handle and run a job on it"""
+    try:
+        if isinstance(cube, tuple):
+            cube = _attach_cube(*cube)
+        return task(cube[row], **job)
+    except Exception as e:
+        return {'status': 'error', 'reason': f'{type(e).__name__}: {e}'}
+
+
+# Rolling-origin backtests: number of forecast origins evaluated per series by default
+BACKTEST_ORIGINS = 8
+
+
+def rolling_origins(n, horizon, n_origins=BACKTEST_ORIGINS, step=None, min_train=20):
+    """Training lengths of the rolling forecast origins, oldest first, spaced step periods apart"""
+    step = step or horizon
+    return np.arange(n - horizon, min_train - 1, -step)[:n_origins][::-1]
+
+
+def backtest_job(series, field, order, season, horizon, origins):
+    """Forecast one series of an entity block from every origin; returns an (origin, lead) matrix
+    
+    Pure function like category_job so origins of all series can be fitted in pool workers.
+    Origins whose fit fails are left as NaN rows.
+    """
+    values = series[field]
+    forecasts = np.full((len(origins), horizon), np.nan)
+    for i, origin in enumerate(origins):
+        try:
+            model = EnhancedARIMAModel(*order, period=season).fit(values[:origin])
+            forecasts[i] = model.forecast(horizon)[:horizon]
+        except Exception:
+            continue
+    return {'status': 'ok', 'forecast': forecasts}
+
+
+def forecast_errors(actual, forecast):
+    """MAE, RMSE and MAPE of (..., origin, lead) forecast arrays, overall and by lead time and origin"""
+    error = forecast - actual
+    absolute = np.abs(error)
+    squared = error ** 2
+    percent = absolute / np.maximum(np.abs(actual), np.finfo(float).eps) * 100
+    return {
+        'mae': np.nanmean(absolute, axis=(-2, -1)),
+        'rmse': np.sqrt(np.nanmean(squared, axis=(-2, -1))),
+        'mape': np.nanmean(percent, axis=(-2, -1)),
+        'mae_by_lead': np.nanmean(absolute, axis=-2),
+        'rmse_by_lead': np.sqrt(np.nanmean(squared, axis=-2)),
+        'mape_by_lead': np.nanmean(percent, axis=-2),
+        'mape_by_origin': np.nanmean(percent, axis=-1)
+    }
+
+
+# Prediction intervals: bootstrap paths per forecast and the quantiles reported as worst/best case
+SIMULATION_PATHS = 2000
+INTERVAL_QUANTILES = (0.1, 0.9)
+INTERVAL_LEVEL = f"{round((INTERVAL_QUANTILES[1] - INTERVAL_QUANTILES[0]) * 100)}%"
+
+# Field rows of the engine's series cube; entity row 0 holds total sales, categories follow
+REVENUE, QUANTITY, REVENUE_SMOOTHED, QUANTITY_SMOOTHED = range(4)
+
+# Training lookback: a number of days, 'auto', or unset for the full history. Windows are applied
+# in whole periods of the engine's resolution and never hold fewer than MIN_LOOKBACK_PERIODS
+AUTO_LOOKBACK_WINDOWS = (56, 91, 182, 364)
+AUTO_LOOKBACK_HOLDOUT = 28
+MIN_LOOKBACK_PERIODS = 15
+
+
+def lookback_periods(days, granularity):
+    """Number of periods of a resolution spanned by a lookback in days"""
+    return max(int(round(days / GRANULARITIES[granularity]['days'])), 1)
+
+
+def parse_lookback(value, granularity='daily'):
+    """Normalize a lookback setting to None, 'auto' or a number of days covering at least
+    MIN_LOOKBACK_PERIODS periods of the given resolution"""
+    if value is None or value == '' or value == 'all':
+        return None
+    if value == 'auto':
+        return 'auto'
+    try:
+        days = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Lookback must be a whole number of days, 'auto' or 'all', got {value!r}") from None
+    minimum = int(np.ceil(MIN_LOOKBACK_PERIODS * GRANULARITIES[granularity]['days']))
+    if days < minimum:
+        unit = GRANULARITIES[granularity]['unit']
+        span = f"{MIN_LOOKBACK_PERIODS} {unit}" + (f" ({minimum} days)" if unit != 'days' else '')
+        raise ValueError(f"Lookback must cover at least {span}, got {days} days")
+    return days
+
+
+def _default_lookback():
+    """FORECAST_LOOKBACK_DAYS, validated once; an invalid value falls back to the full history"""
+    try:
+        return parse_lookback(os.environ.get('FORECAST_LOOKBACK_DAYS') or None)
+    except ValueError as e:
+        print(f"Ignoring FORECAST_LOOKBACK_DAYS: {e}")
+        return None
+
+
+DEFAULT_LOOKBACK = _default_lookback()
+
+
 class SalesForecastingEngine:
     """Sales forecasting engine"""
     
-    def __init__(self, data_file='cleaned_customer_data.csv'):
+    def __init__(self, data_file='cleaned_customer_data.csv', lookback=DEFAULT_LOOKBACK, granularity='daily', fit=True):
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Unknown granularity '{granularity}', expected one of {list(GRANULARITIES)}")
         self.data_file = data_file
-        self.df = None
-        self.daily_sales = None
-        self.category_sales = {}
+        self.granularity = granularity
+        self.lookback = parse_lookback(lookback)
+        self.lookback_days = None
+        self.record_count = 0
+        self.cube = None
+        self.origin = None
+        self.n_periods = 0
+        self.season = GRANULARITIES[granularity]['season']
+        self.category_rows = {}
         self.arima_model = None
         self.category_models = {}
+        self.date_labels = ()
+        self.payload_cache = {}
+        # category_job results by (category, train_size, steps, validate); survive refreshes that leave a category unchanged
+        self.category_results = {}
+        # Cumulative category quantity forecasts and simulated paths per horizon, for what-if scenarios
+        self.scenario_bases = {}
+        self._shm = self._release_shm = None
         
         self._load_and_prepare_data()
-        self._fit_models()
+        if fit:
+            self._fit_models()
+        self.trained_at = datetime.now(timezone.utc).replace(microsecond=0)
+        self.version = self._model_version()
         
     def _load_and_prepare_data(self):
         """Load and prepare time series data"""
+        # A missing or unreadable file leaves an empty engine; errors building the cube are not hidden
         try:
-            self.df = pd.read_csv(self.data_file)
-            self.df['Date'] = pd.to_datetime(self.df['Date'])
-            self._prepare_daily_sales()
-            self._prepare_category_sales()
-            
+            df = pd.read_csv(self.data_file, usecols=['Date', 'Product_Type', 'Revenue', 'Quantity'])
         except FileNotFoundError:
-            self.df = pd.DataFrame()
-            self.daily_sales = None
-        except Exception as e:
-            self.df = pd.DataFrame()
-            self.daily_sales = None
-    
-    def _prepare_daily_sales(self):
-        """Prepare daily aggregates"""
-        if self.df.empty:
+            self.cube = None
+            return
+        except ValueError as e:
+            # Also raised by pandas for unparsable files and missing columns
+            print(f"Could not read {self.data_file}: {e}")
+            self.cube = None
             return
         
-        daily = self.df.groupby('Date').agg({'Revenue': 'sum', 'Quantity': 'sum'}).reset_index()
+        spec = GRANULARITIES[self.granularity]
+        if self.lookback == 'auto':
+            # Candidate windows are scored on the series at the engine's resolution
+            candidates = [w for w in (lookback_periods(days, self.granularity) for days in AUTO_LOOKBACK_WINDOWS)
+                          if w >= MIN_LOOKBACK_PERIODS]
+            window = None
+            if candidates:
+                self._build_cube(df, max(candidates))
+                window = self._auto_lookback(candidates)
+        elif self.lookback is not None:
+            # A lookback sized for daily data still keeps enough periods to fit at coarser resolutions
+            window = max(lookback_periods(self.lookback, self.granularity), MIN_LOOKBACK_PERIODS)
+        else:
+            window = None
+        self._build_cube(df, window)
+        # The history actually kept, which is shorter than the window when the data is
+        if window is not None and self.cube is not None:
+            self.lookback_days = int(round(min(window, self.n_periods) * spec['days']))
+    
+    def _build_cube(self, df, window=None):
+        """Aggregate raw rows into one float32 (entity, field, period) array; the rows are not kept
         
-        # Fill missing days
-        date_range = pd.date_range(daily['Date'].min(), daily['Date'].max(), freq='D')
-        daily = pd.DataFrame({'Date': date_range}).merge(daily, on='Date', how='left').fillna(0)
+        window is the number of most recent periods kept, or None for the full history.
+        """
+        granularity = self.granularity
+        self.record_count = len(df)
         
-        # Smoothing
-        daily['Revenue_Smoothed'] = daily['Revenue'].rolling(3, center=True, min_periods=1).mean()
-        daily['Units_Smoothed'] = daily['Quantity'].rolling(3, center=True, min_periods=1).mean()
+        # Rows without a date cannot be placed on the time axis (the daily groupby dropped them too)
+        dates = pd.to_datetime(df['Date'])
+        if dates.isna().any():
+            df, dates = df[dates.notna()], dates[dates.notna()]
+        if df.empty:
+            return
+        days = dates.to_numpy().astype('datetime64[D]').astype(np.int64)
         
-        self.daily_sales = daily.sort_values('Date').reset_index(drop=True)
-    
-    def _prepare_category_sales(self):
-        """Prepare category aggregates"""
-        if self.df.empty or self.daily_sales is None:
+        # Weeks and months only count once they are fully inside the data, so partial
+        # leading and trailing periods are dropped rather than read as a sales slump
+        periods = _period_index(days, granularity)
+        first, last = int(periods.min()), int(periods.max())
+        if _period_start(first, granularity) != days.min():
+            first += 1
+        if _period_start(last + 1, granularity) != days.max() + 1:
+            last -= 1
+        if window is not None:
+            # Rows older than the lookback window are never aggregated
+            first = max(first, last - window + 1)
+        if last < first:
             return
+        keep = (periods >= first) & (periods <= last)
+        df, days, period_index = df[keep], days[keep], periods[keep] - first
+        n_periods = last - first + 1
         
-        category_daily = self.df.groupby(['Date', 'Product_Type']).agg({
-            'Revenue': 'sum', 'Quantity': 'sum'
-        }).reset_index()
+        # Categories in order of first sale date, ties alphabetical
+        first_sale = pd.Series(days).groupby(df['Product_Type'].to_numpy()).min()
+        order = sorted(first_sale.index, key=lambda c: (first_sale[c], c))
+        self.category_rows = {category: row for row, category in enumerate(order, start=1)}
+        # Rows without a category (blank Product_Type) count towards total sales only
+        entity = df['Product_Type'].map(self.category_rows).to_numpy(dtype=float)
+        categorized = ~np.isnan(entity)
+        category_index = entity[categorized].astype(np.int64) * n_periods + period_index[categorized]
         
-        date_range = pd.date_range(self.daily_sales['Date'].min(), self.daily_sales['Date'].max(), freq='D')
+        # Period sums for every entity in one pass; periods without sales stay zero and missing
+        # amounts add nothing, as in a pandas sum
+        size = (len(order) + 1) * n_periods
+        totals = np.empty((len(order) + 1, 2, n_periods))
+        for field, column in ((REVENUE, 'Revenue'), (QUANTITY, 'Quantity')):
+            weights = np.nan_to_num(df[column].to_numpy(dtype=float))
+            totals[1:, field] = np.bincount(category_index, weights[categorized], size)[n_periods:].reshape(len(order), n_periods)
+            totals[0, field] = np.bincount(period_index, weights, n_periods)
         
-        for category in category_daily['Product_Type'].unique():
-            cat_data = category_daily[category_daily['Product_Type'] == category]
-            cat_filled = pd.DataFrame({'Date': date_range}).merge(
-                cat_data[['Date', 'Revenue', 'Quantity']], on='Date', how='left'
-            ).fillna(0)
-            
-            cat_filled['Revenue_Smoothed'] = cat_filled['Revenue'].rolling(3, center=True, min_periods=1).mean()
-            cat_filled['Quantity_Smoothed'] = cat_filled['Quantity'].rolling(3, center=True, min_periods=1).mean()
-            
-            self.category_sales[category] = cat_filled.sort_values('Date').reset_index(drop=True)
+        cube = np.empty((len(order) + 1, 4, n_periods), dtype=np.float32)
+        cube[:, [REVENUE, QUANTITY]] = totals
+        # Weekly and monthly sums are already smooth; only daily series get the 3-point mean
+        cube[:, [REVENUE_SMOOTHED, QUANTITY_SMOOTHED]] = _smooth3(totals) if granularity == 'daily' else totals
+        
+        spec = GRANULARITIES[granularity]
+        self.cube, self.origin, self.n_periods = cube, first, n_periods
+        self.season = spec['season'] if n_periods >= 2 * spec['season'] else spec['short_season']
+        self.date_labels = tuple(self.dates().strftime('%Y-%m-%d'))
+    
+    def _auto_lookback(self, candidates):
+        """Pick the shortest candidate window (in periods) whose holdout MAPE is not beaten by a longer one"""
+        revenue = self.series(REVENUE_SMOOTHED) if self.cube is not None else np.array([])
+        holdout = lookback_periods(AUTO_LOOKBACK_HOLDOUT, self.granularity)
+        best_mape, best_window = float('inf'), None
+        
+        for window in candidates:
+            if window + holdout > len(revenue):
+                break
+            train = revenue[-(window + holdout):-holdout]
+            actual = revenue[-holdout:].astype(float)
+            try:
+                model = self._model(*self._find_best_arima_params(train, max_p=1, max_d=1, max_q=1))
+                predicted = model.fit(train).forecast(holdout)[:holdout]
+                mape = mean_absolute_percentage_error(actual, predicted) * 100
+            except:
+                continue
+            # A longer window has to earn its extra fitting cost
+            if mape < best_mape - 0.5:
+                best_mape, best_window = mape, window
+        
+        return best_window if best_window is not None else len(revenue)
+    
+    def _model(self, p, d, q):
+        """New ARIMA model using the seasonal period of the engine's resolution"""
+        return EnhancedARIMAModel(p, d, q, period=self.season)
+    
+    def series(self, field, category=None):
+        """View of one series in the cube (total sales when category is None)"""
+        return self.cube[self.category_rows[category] if category is not None else 0, field]
+    
+    def dates(self):
+        """Start date of every period on the cube's time axis"""
+        spec = GRANULARITIES[self.granularity]
+        start = pd.Timestamp(np.datetime64(_period_start(self.origin, self.granularity), 'D'))
+        return pd.date_range(start, periods=self.n_periods, freq=spec['freq'])
+    
+    def weekend_mask(self):
+        """Whether each period is a weekend day (always False above daily resolution)"""
+        if self.granularity != 'daily':
+            return np.zeros(self.n_periods, dtype=bool)
+        # Day 0 of the Unix epoch was a Thursday
+        return (self.origin + np.arange(self.n_periods) + 3) % 7 >= 5
+    
+    @property
+    def last_date(self):
+        return pd.Timestamp(np.datetime64(_period_start(self.origin + self.n_periods - 1, self.granularity), 'D'))
+    
+    @property
+    def recent_periods(self):
+        """Periods of this resolution in the trailing average-price window (at least one)"""
+        return lookback_periods(RECENT_PRICE_DAYS, self.granularity)
+    
+    def horizon_steps(self, period):
+        """Number of forecast steps for a horizon name such as '7days' or '13weeks'"""
+        horizons = GRANULARITIES[self.granularity]['horizons']
+        return horizons.get(period, next(iter(horizons.values())))
     
     def _find_best_arima_params(self, series, max_p=2, max_d=1, max_q=2):
         """Find optimal ARIMA parameters"""
-        if len(series) < 15:
-            return (1, 1, 1)
-        
-        best_aic, best_params = float('inf'), (1, 1, 1)
-        
-        for p in range(max_p + 1):
-            for d in range(max_d + 1):
-                for q in range(max_q + 1):
-                    if p + q > 0 and len(series) > p + d + q + 10:
-                        try:
-                            model = EnhancedARIMAModel(p, d, q)
-                            model.fit(series)
-                            aic = model.calculate_aic()
-                            if aic < best_aic:
-                                best_aic, best_params = aic, (p, d, q)
-                        except:
-                            continue
-        return best_params
-    
-    def _fit_models(self):
-        """Fit ARIMA models"""
-        if self.daily_sales is None or len(self.daily_sales) < 15:
+        return find_best_arima_params(series, self.season, max_p, max_d, max_q)
+    
+    def _select_order(self, name, series, searches):
+        """Warm-started order for a named series of this engine's data file and resolution"""
+        key = f"{os.path.abspath(self.data_file)}|{self.granularity}|{self.season}|{name}"
+        order, how = select_order(key, series, self.season, seasonal_p=seasonal_ar_orders(self.season))
+        searches[how] = searches.get(how, 0) + 1
+        return order
+    
+    def _fit_models(self, categories=None, main=True):
+        """Fit ARIMA models (the main model if main, and the given categories or all of them)"""
+        if self.n_periods < 15:
             return
         
+        searches = {}
         try:
             # Main model
-            revenue = self.daily_sales['Revenue_Smoothed'].values
-            p, d, q = self._find_best_arima_params(revenue)
-            self.arima_model = EnhancedARIMAModel(p, d, q)
-            self.arima_model.fit(revenue)
-            print(f"Main model: ARIMA({p},{d},{q}), AIC: {self.arima_model.calculate_aic():.4f}")
+            if main:
+                revenue = self.series(REVENUE_SMOOTHED)
+                p, d, q = self._select_order('(total)', revenue, searches)
+                self.arima_model = self._model(p, d, q)
+                self.arima_model.fit(revenue)
+                print(f"Main model: ARIMA({p},{d},{q}), AIC: {self.arima_model.calculate_aic():.4f}")
             
             # Category models
-            for category, cat_data in self.category_sales.items():
-                if len(cat_data) >= 15 and cat_data['Quantity'].sum() > 0:
+            for category in (self.category_rows if categories is None else categories):
+                if self.series(QUANTITY, category).sum(dtype=float) > 0:
                     try:
-                        quantity = cat_data['Quantity_Smoothed'].values
-                        p, d, q = self._find_best_arima_params(quantity)
-                        model = EnhancedARIMAModel(p, d, q)
+                        quantity = self.series(QUANTITY_SMOOTHED, category)
+                        p, d, q = self._select_order(category, quantity, searches)
+                        model = self._model(p, d, q)
                         model.fit(quantity)
                         
                         if model.calculate_metrics()['mape'] < 200:
@@ -380,28 +1043,206 @@ class SalesForecastingEngine:
                     except:
                         continue
             
+            print("Order selection: " + ", ".join(f"{n} {how}" for how, n in searches.items()))
         except Exception as e:
             pass
     
+    def _changed_categories(self, fresh):
+        """Categories whose aggregates differ between this engine's cube and a freshly built one, and
+        whether total sales changed; (None, True) when the time axis moved and every series is affected
+        
+        A pure append (same origin and season, more periods) is compared on the overlapping
+        periods: a category counts as changed when those differ or it sold anything in the
+        new ones. Categories without new sales keep their fit.
+        """
+        if self.cube is None or fresh.cube is None or (self.origin, self.season) != (fresh.origin, fresh.season) \
+                or fresh.n_periods < self.n_periods:
+            return None, True
+        
+        n = self.n_periods
+        raw = [REVENUE, QUANTITY]
+        common = [c for c in fresh.category_rows if c in self.category_rows]
+        old_rows = [self.category_rows[c] for c in common]
+        new_rows = [fresh.category_rows[c] for c in common]
+        new = fresh.cube[new_rows][:, raw]
+        differs = (self.cube[old_rows][:, raw] != new[:, :, :n]).any(axis=(1, 2))
+        differs |= (new[:, :, n:] != 0).any(axis=(1, 2))
+        changed = [c for c, d in zip(common, differs) if d]
+        changed += [c for c in fresh.category_rows if c not in self.category_rows]
+        changed += [c for c in self.category_rows if c not in fresh.category_rows]
+        return changed, fresh.n_periods != n or not np.array_equal(self.cube[0], fresh.cube[0])
+    
+    def refresh(self):
+        """Pick up a changed data file: build a new engine, refitting only what changed
+        
+        Returns None when the file is unchanged, otherwise (engine, categories refitted).
+        This engine is left untouched for the requests still using it; the new one shares
+        the category results and models of untouched categories, so their part of the
+        payloads is reused, and rebuilds the encoded payloads on request.
+        """
+        if self.version == self._model_version():
+            return None
+        
+        fresh = SalesForecastingEngine(self.data_file, self.lookback, self.granularity, fit=False)
+        changed, total_changed = self._changed_categories(fresh)
+        if changed is None:
+            changed = list(fresh.category_rows)
+        else:
+            changed_set = set(changed)
+            # Results are keyed by training size, which only means the same thing on the same time axis
+            if fresh.n_periods == self.n_periods:
+                fresh.category_results = {k: r for k, r in self.category_results.items() if k[0] not in changed_set}
+            # Kept models read their history from the new cube: identical values, plus any appended idle periods
+            for category, model in self.category_models.items():
+                if category not in changed_set:
+                    fresh.category_models[category] = model = copy.copy(model)
+                    model.original_data = fresh.series(QUANTITY_SMOOTHED, category)
+            if not total_changed and self.arima_model is not None:
+                fresh.arima_model = copy.copy(self.arima_model)
+                fresh.arima_model.original_data = fresh.series(REVENUE_SMOOTHED)
+        
+        fresh._fit_models([c for c in changed if c in fresh.category_rows], main=total_changed)
+        fresh.trained_at = datetime.now(timezone.utc).replace(microsecond=0)
+        fresh.version = fresh._model_version()
+        return fresh, changed
+    
+    def memory_usage(self):
+        """Approximate bytes held by the cube, fitted model state and cached payloads"""
+        total = self.cube.nbytes if self.cube is not None else 0
+        models = [self.arima_model, *self.category_models.values()]
+        models += [result['model'] for result in self.category_results.values() if 'model' in result]
+        for model in models:
+            if model is not None and model.resid_pool is not None:
+                total += model.resid_pool.nbytes
+        total += sum(base['paths'].nbytes for base in self.scenario_bases.values())
+        return total + sum(len(body) for body in self.payload_cache.values())
+    
+    def __getstate__(self):
+        # Shared memory is per process; the artifact holds a private copy of the cube
+        state = self.__dict__.copy()
+        state['cube'] = np.array(self.cube) if self.cube is not None else None
+        # Request threads keep filling these while an evicted engine is written out
+        state['payload_cache'] = dict(self.payload_cache)
+        state['category_results'] = dict(self.category_results)
+        state['scenario_bases'] = dict(self.scenario_bases)
+        state['_shm'] = state['_release_shm'] = None
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__dict__.setdefault('category_results', {})
+        self.__dict__.setdefault('scenario_bases', {})
+        # Models read their history from the cube again instead of unpickled copies
+        if self.arima_model is not None:
+            self.arima_model.original_data = self.series(REVENUE_SMOOTHED)
+        for category, model in self.category_models.items():
+            model.original_data = self.series(QUANTITY_SMOOTHED, category)
+    
+    def _model_version(self):
+        """Digest of the data file, training settings and fitted orders; served payloads depend only on these"""
+        try:
+            stat = os.stat(self.data_file)
+            data = (stat.st_size, stat.st_mtime_ns)
+        except OSError:
+            data = None
+        
+        orders = [(name, (model.p, model.d, model.q)) for name, model in self.category_models.items()]
+        if self.arima_model is not None:
+            orders.insert(0, (None, (self.arima_model.p, self.arima_model.d, self.arima_model.q)))
+        key = (os.path.abspath(self.data_file), data, self.granularity, self.lookback_days, self.origin, self.n_periods, orders)
+        return hashlib.sha1(repr(key).encode()).hexdigest()[:16]
+    
+    def _revenue_payload(self, calendar, predicted, lower, upper, worst_case, best_case,
+                         train_size=None, test_predicted=()):
+        """Summary, daily forecast and line graph of a revenue forecast over the future calendar
+        
+        Periods from train_size on are drawn as the test window with their test_predicted
+        values; without a train_size the whole history is training data.
+        """
+        steps = len(calendar['date'])
+        train_size = self.n_periods if train_size is None else train_size
+        
+        # Line graph data, assembled column-wise from whole arrays
+        labels = self.date_labels
+        actual = np.round(self.series(REVENUE).astype(float), 2)
+        actual_list = actual.tolist()
+        test_predicted = np.round(test_predicted, 2).tolist()
+        future_predicted = np.round(predicted, 2).tolist()
+        lower, upper = np.round(lower, 2).tolist(), np.round(upper, 2).tolist()
+        
+        line_data = [
+            {'date': d, 'actual': a, 'testPredicted': None, 'futurePredicted': None, 'type': 'training'}
+            for d, a in zip(labels[:train_size], actual_list[:train_size])
+        ]
+        line_data.extend(
+            {'date': d, 'actual': a, 'testPredicted': t, 'futurePredicted': None, 'type': 'test'}
+            for d, a, t in zip(labels[train_size:], actual_list[train_size:], test_predicted)
+        )
+        
+        # Add connection point - bridge from actual data to future forecast
+        line_data.append({
+            'date': labels[-1],
+            'actual': actual_list[-1],
+            'testPredicted': None,
+            'futurePredicted': actual_list[-1],
+            'type': 'bridge'
+        })
+        
+        # Future forecasts (predicted only, beyond CSV data)
+        daily_future = [
+            {'date': d, 'predicted': v, 'lower': lo, 'upper': hi, 'day_name': n, 'is_weekend': w}
+            for d, v, lo, hi, n, w in zip(calendar['date'], future_predicted, lower, upper,
+                                          calendar['day_name'], calendar['is_weekend'])
+        ]
+        line_data.extend(
+            {'date': d, 'actual': None, 'testPredicted': None, 'futurePredicted': v, 'type': 'forecast'}
+            for d, v in zip(calendar['date'], future_predicted)
+        )
+        
+        # Calculate metrics
+        total_predicted = float(sum(future_predicted))
+        historical_revenue = float(actual[-steps:].sum())
+        
+        if historical_revenue > 0:
+            growth_rate = ((total_predicted - historical_revenue) / historical_revenue) * 100
+        else:
+            growth_rate = 0.0
+        
+        return {
+            'summary': {
+                'predictedRevenue': round(total_predicted, 2),
+                'growthRate': round(growth_rate, 1),
+                'bestCase': round(float(best_case), 2),
+                'worstCase': round(float(worst_case), 2),
+                'intervalLevel': INTERVAL_LEVEL,
+                'dailyAverage': round(total_predicted / steps, 2),
+                'historicalRevenue': round(historical_revenue, 2)
+            },
+            'dailyForecast': daily_future,
+            'lineGraphData': line_data
+        }
+    
     def generate_forecast(self, period='7days'):
         """Generate forecast with train-test split validation and bias adjustment"""
         if self.arima_model is None:
             return self._empty_forecast()
         
         try:
-            steps = 7 if period == '7days' else 15
+            steps = self.horizon_steps(period)
+            unit = GRANULARITIES[self.granularity]['unit']
             
             # Step 1: Calculate train-test split for validation
-            total_data_points = len(self.daily_sales)
+            total_data_points = self.n_periods
             test_size = max(int(total_data_points * 0.25), steps)
             test_size = min(test_size, total_data_points // 3)
             train_size = total_data_points - test_size
             
             # Step 2: Train on training data and get validation metrics
-            train_data = self.daily_sales['Revenue_Smoothed'].values[:train_size]
-            test_data_actual = self.daily_sales['Revenue_Smoothed'].values[train_size:]
+            smoothed = self.series(REVENUE_SMOOTHED)
+            train_data = smoothed[:train_size]
+            test_data_actual = smoothed[train_size:].astype(float)
             
-            temp_model = EnhancedARIMAModel(self.arima_model.p, self.arima_model.d, self.arima_model.q)
+            temp_model = self._model(self.arima_model.p, self.arima_model.d, self.arima_model.q)
             temp_model.fit(train_data)
             
             # Forecast test period for visualization
@@ -418,113 +1259,44 @@ class SalesForecastingEngine:
             metrics = temp_model.calculate_metrics(steps)
             
             # Step 3: Now retrain on ALL data (train + test) for future forecasts
-            all_data = self.daily_sales['Revenue_Smoothed'].values
-            final_model = EnhancedARIMAModel(self.arima_model.p, self.arima_model.d, self.arima_model.q)
+            all_data = smoothed
+            final_model = self._model(self.arima_model.p, self.arima_model.d, self.arima_model.q)
             final_model.fit(all_data)
             
             # Forecast future periods beyond the data
             future_forecasts = final_model.forecast(steps)
             
-            # Get dates
-            train_end_date = self.daily_sales['Date'].iloc[train_size - 1]
-            last_date = self.daily_sales['Date'].max()
-            
-            # Line graph data
-            line_data = []
-            
-            # Training period (actual only)
-            for i in range(train_size):
-                row = self.daily_sales.iloc[i]
-                line_data.append({
-                    'date': row['Date'].strftime('%Y-%m-%d'),
-                    'actual': float(row['Revenue']),
-                    'testPredicted': None,
-                    'futurePredicted': None,
-                    'type': 'training'
-                })
-            
-            # Test period (both actual and ADJUSTED predicted for validation)
-            for i in range(test_size):
-                row = self.daily_sales.iloc[train_size + i]
-                revenue = max(0, test_forecasts_adjusted[i])  # Use adjusted forecasts
-                is_weekend = row['Date'].weekday() >= 5
-                if is_weekend:
-                    revenue *= 0.8
-                
-                line_data.append({
-                    'date': row['Date'].strftime('%Y-%m-%d'),
-                    'actual': float(row['Revenue']),
-                    'testPredicted': round(revenue, 2),
-                    'futurePredicted': None,
-                    'type': 'test'
-                })
-            
-            # Add connection point - bridge from actual data to future forecast
-            line_data.append({
-                'date': last_date.strftime('%Y-%m-%d'),
-                'actual': float(self.daily_sales.iloc[-1]['Revenue']),
-                'testPredicted': None,
-                'futurePredicted': float(self.daily_sales.iloc[-1]['Revenue']),
-                'type': 'bridge'
-            })
-            
-            # Future forecasts (predicted only, beyond CSV data)
-            daily_future = []
-            for i in range(steps):
-                date = last_date + timedelta(days=i+1)
-                revenue = max(0, future_forecasts[i])
-                is_weekend = date.weekday() >= 5
-                
-                if is_weekend:
-                    revenue *= 0.8
-                
-                daily_future.append({
-                    'date': date.strftime('%Y-%m-%d'),
-                    'predicted': round(revenue, 2),
-                    'day_name': date.strftime('%A'),
-                    'is_weekend': is_weekend
-                })
-                
-                line_data.append({
-                    'date': date.strftime('%Y-%m-%d'),
-                    'actual': None,
-                    'testPredicted': None,
-                    'futurePredicted': round(revenue, 2),
-                    'type': 'forecast'
-                })
+            last_date = self.last_date
+            labels = self.date_labels
+            test_weekend = self.weekend_mask()[train_size:]
+            test_predicted = np.maximum(test_forecasts_adjusted, 0) * np.where(test_weekend, 0.8, 1.0)
             
-            # Calculate metrics
-            total_predicted = sum(f['predicted'] for f in daily_future)
-            historical_revenue = self.daily_sales['Revenue'].tail(steps).sum()
+            calendar = _future_calendar(last_date, steps, self.granularity)
+            weekend_factor = np.where(calendar['weekend_mask'], 0.8, 1.0)
+            future_predicted = np.maximum(future_forecasts[:steps], 0) * weekend_factor
             
-            if historical_revenue > 0:
-                growth_rate = ((total_predicted - historical_revenue) / historical_revenue) * 100
-            else:
-                growth_rate = 0.0
+            # Prediction intervals from bootstrap paths, adjusted like the point forecast
+            paths = final_model.simulate(steps, SIMULATION_PATHS) * weekend_factor
+            lower, upper = np.quantile(paths, INTERVAL_QUANTILES, axis=0)
+            worst_case, best_case = np.quantile(paths.sum(axis=1, dtype=float), INTERVAL_QUANTILES)
             
-            # Use MAPE for uncertainty calculation
-            uncertainty = min(0.5, metrics['mape'] / 100)
+            category_errors = []
             
             return {
-                'summary': {
-                    'predictedRevenue': round(total_predicted, 2),
-                    'growthRate': round(growth_rate, 1),
-                    'bestCase': round(total_predicted * (1 + uncertainty * 0.5), 2),
-                    'worstCase': round(total_predicted * (1 - uncertainty * 0.3), 2),
-                    'dailyAverage': round(total_predicted / steps, 2),
-                    'historicalRevenue': round(historical_revenue, 2)
-                },
-                'dailyForecast': daily_future,
-                'categoryForecast': self._category_forecast(steps, last_date, train_size, test_size),
-                'lineGraphData': line_data,
-                'topProducts': self._top_products(steps, train_size, test_size),
+                **self._revenue_payload(calendar, future_predicted, lower, upper, worst_case, best_case,
+                                        train_size, test_predicted),
+                'categoryForecast': self._category_forecast(steps, last_date, train_size, test_size, category_errors),
+                'topProducts': self._top_products(steps, train_size, test_size, category_errors),
+                'categoryErrors': category_errors,
                 'modelInfo': {
                     'type': f'ARIMA({self.arima_model.p},{self.arima_model.d},{self.arima_model.q})',
-                    'dataPoints': len(self.daily_sales),
-                    'forecastHorizon': f'{steps} days (future)',
-                    'validationPeriod': f'{test_size} days',
-                    'lastDataDate': last_date.strftime('%Y-%m-%d'),
-                    'trainEndDate': train_end_date.strftime('%Y-%m-%d'),
+                    'dataPoints': self.n_periods,
+                    'lookbackDays': self.lookback_days if self.lookback_days is not None else 'all',
+                    'granularity': self.granularity,
+                    'forecastHorizon': f'{steps} {unit} (future)',
+                    'validationPeriod': f'{test_size} {unit}',
+                    'lastDataDate': labels[-1],
+                    'trainEndDate': labels[train_size - 1],
                     'accuracy': f"{round(max(0, 100 - metrics['mape']), 1)}%",
                     'mape': f"{round(metrics['mape'], 1)}%",
                     'categoryModels': len(self.category_models),
@@ -532,150 +1304,336 @@ class SalesForecastingEngine:
                     'testSize': test_size,
                     'maePercent': f"{round(metrics.get('mae_normalized', 0) * 100, 1)}%",
                     'rmsePercent': f"{round(metrics.get('rmse_normalized', 0) * 100, 1)}%",
-                    'adjustmentFactor': f"{round(adjustment_factor, 3)}"
+                    'adjustmentFactor': f"{round(adjustment_factor, 3)}",
+                    'tier': 'full'
                 }
             }
         except Exception as e:
             return self._empty_forecast()
     
-    def _category_forecast(self, steps, last_date, train_size=None, test_size=None):
-        """Category forecasts - validate on test, then forecast future"""
+    def generate_fast_forecast(self, period='7days'):
+        """Forecast without validation or refits, for requests whose latency budget cannot cover generate_forecast
+        
+        The main and category models are used as fitted at load time (their last selected
+        orders); without a main model the revenue forecast is seasonal-naive.
+        """
+        if self.cube is None or self.n_periods == 0:
+            empty = self._empty_forecast()
+            empty['modelInfo']['tier'] = 'fast'
+            return empty
+        
+        steps = self.horizon_steps(period)
+        unit = GRANULARITIES[self.granularity]['unit']
+        last_date = self.last_date
+        calendar = _future_calendar(last_date, steps, self.granularity)
+        
+        if self.arima_model is not None:
+            model = self.arima_model
+            weekend_factor = np.where(calendar['weekend_mask'], 0.8, 1.0)
+            predicted = np.maximum(model.forecast(steps)[:steps], 0) * weekend_factor
+            paths = model.simulate(steps, SIMULATION_PATHS) * weekend_factor
+            lower, upper = np.quantile(paths, INTERVAL_QUANTILES, axis=0)
+            worst_case, best_case = np.quantile(paths.sum(axis=1, dtype=float), INTERVAL_QUANTILES)
+            method = f'ARIMA({model.p},{model.d},{model.q})'
+        else:
+            # The last full season repeated; no interval without a fitted error model
+            season = min(self.season, self.n_periods)
+            predicted = np.resize(np.round(self.series(REVENUE)[-season:].astype(float), 2), steps)
+            lower = upper = predicted
+            worst_case = best_case = predicted.sum()
+            method = 'Seasonal naive'
+        
+        jobs = self._fitted_category_jobs(steps)
+        
+        return {
+            **self._revenue_payload(calendar, predicted, lower, upper, worst_case, best_case),
+            'categoryForecast': self._category_forecast(steps, last_date, jobs=jobs),
+            'topProducts': self._top_products(steps, jobs=jobs),
+            'categoryErrors': [],
+            'modelInfo': {
+                'type': method,
+                'dataPoints': self.n_periods,
+                'lookbackDays': self.lookback_days if self.lookback_days is not None else 'all',
+                'granularity': self.granularity,
+                'forecastHorizon': f'{steps} {unit} (future)',
+                'validationPeriod': 'none',
+                'lastDataDate': self.date_labels[-1],
+                'categoryModels': len(self.category_models),
+                'tier': 'fast'
+            }
+        }
+    
+    def _share_cube(self):
+        """Publish the cube in shared memory so pool workers map it instead of receiving copies"""
+        if self._shm is None:
+            shm = SharedMemory(create=True, size=self.cube.nbytes)
+            shared = np.ndarray(self.cube.shape, dtype=np.float32, buffer=shm.buf)
+            shared[:] = self.cube
+            self.cube, self._shm = shared, shm
+            # The segment name is removed when the engine is closed or garbage collected;
+            # the mapping itself stays valid for arrays that still reference it
+            self._release_shm = weakref.finalize(self, _unlink_shared, shm)
+        return (self._shm.name, self.cube.shape)
+    
+    def close(self):
+        """Unlink the shared-memory copy of the cube, if one was published"""
+        if self._shm is not None:
+            self._release_shm()
+            self._shm = None
+    
+    def _map_jobs(self, rows, jobs, task=category_job):
+        """Run a job per cube entity, in the worker pool when there are enough of them; results keep job order"""
+        pool = get_worker_pool() if len(rows) >= PARALLEL_MIN_CATEGORIES else None
+        if pool is not None:
+            try:
+                handle = self._share_cube()
+                return list(pool.map(_run_category_job, [handle] * len(rows), rows, jobs, [task] * len(rows)))
+            except BrokenProcessPool as e:
+                print(f"Worker pool broken, restarting it and running categories in-process: {e}")
+                discard_worker_pool(pool)
+            except (OSError, RuntimeError) as e:
+                # Also covers a pool another thread has just discarded
+                print(f"Worker pool unavailable, running categories in-process: {e}")
+        
+        return [_run_category_job(self.cube, row, job, task) for row, job in zip(rows, jobs)]
+    
+    def _run_category_jobs(self, train_size, steps, validate):
+        """Run category_job for every category; results come back in category order
+        
+        Successful and skipped results are kept in category_results, so only categories
+        without one (new, or changed by a refresh) are computed.
+        """
+        results = {c: self.category_results.get((c, train_size, steps, validate)) for c in self.category_rows}
+        missing = [c for c, result in results.items() if result is None]
+        jobs = [dict(order=(self.category_models[c].p, self.category_models[c].d, self.category_models[c].q)
+                     if c in self.category_models else None,
+                     train_size=train_size, steps=steps, season=self.season, validate=validate,
+                     recent=self.recent_periods)
+                for c in missing]
+        rows = [self.category_rows[c] for c in missing]
+        for category, result in zip(missing, self._map_jobs(rows, jobs)):
+            results[category] = result
+            if result['status'] != 'error':
+                self.category_results[(category, train_size, steps, validate)] = result
+        return list(results.items())
+    
+    def backtest(self, period=None, n_origins=BACKTEST_ORIGINS, step=None):
+        """Rolling-origin accuracy of the selected orders for total revenue and every category model
+        
+        Each origin refits on the smoothed history up to it and is scored against the raw
+        values of the following horizon; all series' errors are computed in one array pass.
+        """
+        steps = self.horizon_steps(period or next(iter(GRANULARITIES[self.granularity]['horizons'])))
+        origins = rolling_origins(self.n_periods, steps, n_origins, step, min_train=max(20, 2 * self.season))
+        if self.arima_model is None or len(origins) == 0:
+            return {'error': 'Not enough history to backtest', 'series': []}
+        
+        names = [None, *self.category_models]
+        models = [self.arima_model, *self.category_models.values()]
+        rows = [0] + [self.category_rows[c] for c in self.category_models]
+        fields = [REVENUE] + [QUANTITY] * len(self.category_models)
+        
+        # One job per (series, chunk of origins), so the origins of even a few series spread over the pool
+        n_chunks = min(len(origins), -(-2 * FORECAST_WORKERS // len(rows)))
+        chunks = [chunk for chunk in np.array_split(np.arange(len(origins)), n_chunks) if len(chunk)]
+        tasks = [(i, chunk) for i in range(len(rows)) for chunk in chunks]
+        jobs = [dict(field=REVENUE_SMOOTHED if names[i] is None else QUANTITY_SMOOTHED,
+                     order=(models[i].p, models[i].d, models[i].q),
+                     season=self.season, horizon=steps, origins=origins[chunk])
+                for i, chunk in tasks]
+        results = self._map_jobs([rows[i] for i, _ in tasks], jobs, backtest_job)
+        
+        errors = []
+        forecasts = np.full((len(rows), len(origins), steps), np.nan)
+        for (i, chunk), result in zip(tasks, results):
+            if result['status'] == 'ok':
+                forecasts[i, chunk] = result['forecast']
+            else:
+                _report_error(errors, names[i] or 'Total', result['reason'])
+        
+        window = origins[:, None] + np.arange(steps)
+        actual = self.cube[rows, fields][:, window].astype(float)
+        scores = forecast_errors(actual, forecasts)
+        
+        dates = self.dates()
+        series = [{
+            'name': name or 'Total',
+            'target': 'revenue' if name is None else 'quantity',
+            'model': f"ARIMA({m.p},{m.d},{m.q})",
+            'mae': round(float(scores['mae'][i]), 2),
+            'rmse': round(float(scores['rmse'][i]), 2),
+            'mape': round(float(scores['mape'][i]), 2),
+            'mapeByLead': np.round(scores['mape_by_lead'][i], 2),
+            'mapeByOrigin': np.round(scores['mape_by_origin'][i], 2)
+        } for i, (name, m) in enumerate(zip(names, models))]
+        
+        return {
+            'series': series,
+            'errors': errors,
+            'origins': [dates[o].strftime('%Y-%m-%d') for o in origins],
+            'forecastSteps': steps,
+            'granularity': self.granularity
+        }
+    
+    def _fitted_category_jobs(self, steps):
+        """category_job-shaped results from the already fitted category models, without refitting"""
+        jobs = []
+        for category, model in self.category_models.items():
+            block = self.cube[self.category_rows[category]]
+            jobs.append((category, {
+                'status': 'ok',
+                'order': (model.p, model.d, model.q),
+                'mape': None,
+                'forecast': model.forecast(steps),
+                'model': model,
+                'recent_revenue': float(block[REVENUE, -self.recent_periods:].sum(dtype=float)),
+                'recent_quantity': float(block[QUANTITY, -self.recent_periods:].sum(dtype=float)),
+                'history_quantity': float(block[QUANTITY, -steps:].sum(dtype=float))
+            }))
+        return jobs
+    
+    def _category_forecast(self, steps, last_date, train_size=None, test_size=None, errors=None, jobs=None):
+        """Category forecasts - validate on test, then forecast future (or use the given job results)"""
         results = []
         
         if train_size is None:
-            train_size = len(self.daily_sales)
+            train_size = self.n_periods
         if test_size is None:
-            test_size = max(int(len(self.daily_sales) * 0.25), steps)
+            test_size = max(int(self.n_periods * 0.25), steps)
         
-        for category, cat_data in self.category_sales.items():
-            try:
-                quantity = cat_data['Quantity_Smoothed'].values
-                
-                if len(quantity) < 15 or cat_data['Quantity'].sum() == 0:
-                    continue
-                
-                cat_train_size = min(train_size, len(quantity))
-                cat_test_size = len(quantity) - cat_train_size
-                
-                if cat_train_size < 10:
-                    continue
-                
-                train_quantity = quantity[:cat_train_size]
-                
-                if category in self.category_models:
-                    model = self.category_models[category]
-                    p, d, q = model.p, model.d, model.q
-                else:
-                    p, d, q = self._find_best_arima_params(train_quantity, max_p=1, max_d=1, max_q=1)
-                
-                temp_cat_model = EnhancedARIMAModel(p, d, q)
-                temp_cat_model.fit(train_quantity)
-                
-                cat_metrics = temp_cat_model.calculate_metrics(min(cat_test_size, steps))
-                
-                # Skip categories with MAPE > 300%
-                if cat_metrics['mape'] > 300:
-                    continue
-                
-                final_cat_model = EnhancedARIMAModel(p, d, q)
-                final_cat_model.fit(quantity)
-                
-                future_forecasts = final_cat_model.forecast(steps)
-                
-                avg_price = 0.0
-                if len(cat_data) > 0:
-                    recent = cat_data.tail(min(14, len(cat_data)))
-                    rev = float(recent['Revenue'].sum())
-                    qty = float(recent['Quantity'].sum())
-                    avg_price = (rev / qty) if qty > 0 else 0.0
-                
-                daily = []
-                for i in range(steps):
-                    date = last_date + timedelta(days=i+1)
-                    qty = max(0, float(future_forecasts[i]))
-                    rev = round(qty * avg_price, 2) if avg_price > 0 else 0.0
-                    
-                    daily.append({
-                        'date': date.strftime('%Y-%m-%d'),
-                        'predicted_quantity': round(qty, 0),
-                        'predicted_revenue': rev,
-                        'day_name': date.strftime('%A'),
-                        'is_weekend': date.weekday() >= 5
-                    })
-                
-                total = int(sum(f['predicted_quantity'] for f in daily))
-                
-                if total >= 0 and len(daily) > 0:
-                    results.append({
-                        'category': category,
-                        'total_predicted_quantity': total,
-                        'daily_average': round(total / len(daily), 1) if len(daily) > 0 else 0,
-                        'daily_forecasts': daily,
-                        'validation_mape': round(cat_metrics['mape'], 1)
-                    })
-            except Exception as e:
+        calendar = _future_calendar(last_date, steps, self.granularity)
+        simulated = []
+        
+        if jobs is None:
+            jobs = self._run_category_jobs(train_size, steps, validate=True)
+        for category, job in jobs:
+            if job['status'] == 'error' and errors is not None:
+                _report_error(errors, category, job['reason'])
+            if job['status'] != 'ok':
                 continue
+            
+            qty = job['recent_quantity']
+            avg_price = (job['recent_revenue'] / qty) if qty > 0 else 0.0
+            
+            qty = np.maximum(job['forecast'][:steps], 0)
+            predicted_quantity = np.round(qty, 0)
+            if avg_price > 0:
+                predicted_revenue = np.round(qty * avg_price, 2).tolist()
+            else:
+                predicted_revenue = [0.0] * len(qty)
+            
+            daily = [
+                {'date': d, 'predicted_quantity': pq, 'predicted_revenue': pr, 'day_name': n, 'is_weekend': w}
+                for d, pq, pr, n, w in zip(calendar['date'], predicted_quantity.tolist(), predicted_revenue,
+                                           calendar['day_name'], calendar['is_weekend'])
+            ]
+            
+            total = int(predicted_quantity.sum())
+            
+            if total >= 0 and len(daily) > 0:
+                results.append({
+                    'category': category,
+                    'total_predicted_quantity': total,
+                    'daily_average': round(total / len(daily), 1) if len(daily) > 0 else 0,
+                    'daily_forecasts': daily,
+                    'validation_mape': round(job['mape'], 1) if job['mape'] is not None else None
+                })
+                simulated.append(job['model'])
+        
+        # Quantity intervals for every category from one batched simulation
+        if simulated:
+            paths = simulate_paths(simulated, steps, SIMULATION_PATHS)
+            low, high = np.quantile(paths.sum(axis=2, dtype=float), INTERVAL_QUANTILES, axis=1)
+            for result, lo, hi in zip(results, low.tolist(), high.tolist()):
+                result['quantity_lower'] = int(round(lo))
+                result['quantity_upper'] = int(round(hi))
         
         return sorted(results, key=lambda x: x['total_predicted_quantity'], reverse=True)
     
-    def _top_products(self, future_steps=7, train_size=None, test_size=None):
-        """Top products forecast - validate then forecast future"""
+    def _top_products(self, future_steps=7, train_size=None, test_size=None, errors=None, jobs=None):
+        """Top products forecast - validate then forecast future (or use the given job results)"""
         products = []
         
         if train_size is None:
-            train_size = len(self.daily_sales) - (test_size or 7)
+            train_size = self.n_periods - (test_size or 7)
         
-        for category, cat_data in self.category_sales.items():
-            if len(cat_data) < 15:
+        if jobs is None:
+            jobs = self._run_category_jobs(train_size, future_steps, validate=False)
+        for category, job in jobs:
+            if job['status'] == 'error' and errors is not None:
+                _report_error(errors, category, job['reason'])
+            if job['status'] != 'ok' or job['recent_quantity'] == 0:
                 continue
             
-            try:
-                quantity = cat_data['Quantity_Smoothed'].values
-                cat_train_size = min(train_size, len(quantity))
-                
-                if cat_train_size < 10:
-                    continue
-                
-                train_quantity = quantity[:cat_train_size]
-                
-                if category in self.category_models:
-                    model = self.category_models[category]
-                    p, d, q = model.p, model.d, model.q
-                else:
-                    p, d, q = self._find_best_arima_params(train_quantity, max_p=1, max_d=1, max_q=1)
-                
-                final_model = EnhancedARIMAModel(p, d, q)
-                final_model.fit(quantity)
-                
-                forecasts = final_model.forecast(future_steps)
-                total_qty = sum(max(0, q) for q in forecasts)
-                
-                recent = cat_data.tail(min(14, len(cat_data)))
-                recent_rev = float(recent['Revenue'].sum())
-                recent_qty = float(recent['Quantity'].sum())
-                
-                if recent_qty == 0:
-                    continue
-                
-                avg_price = recent_rev / recent_qty
-                predicted_sales = total_qty * avg_price
-                
-                hist_qty = cat_data['Quantity'].tail(future_steps).sum()
-                growth = ((total_qty - hist_qty) / hist_qty * 100) if hist_qty > 0 else 0.0
-                
-                if predicted_sales > 0:
-                    products.append({
-                        'name': category,
-                        'predictedSales': round(predicted_sales, 2),
-                        'predictedQuantity': int(total_qty),
-                        'growth': round(growth, 1),
-                        'avgPrice': round(avg_price, 2)
-                    })
-            except:
-                continue
+            total_qty = float(np.maximum(job['forecast'], 0).sum())
+            avg_price = job['recent_revenue'] / job['recent_quantity']
+            predicted_sales = total_qty * avg_price
+            
+            hist_qty = job['history_quantity']
+            growth = ((total_qty - hist_qty) / hist_qty * 100) if hist_qty > 0 else 0.0
+            
+            if predicted_sales > 0:
+                products.append({
+                    'name': category,
+                    'predictedSales': round(predicted_sales, 2),
+                    'predictedQuantity': int(total_qty),
+                    'growth': round(growth, 1),
+                    'avgPrice': round(avg_price, 2)
+                })
         
         return sorted(products, key=lambda x: x['predictedSales'], reverse=True)[:10]
     
+    def _scenario_base(self, steps):
+        """Fitted category forecasts, unit prices and simulated quantity paths, cumulated over the horizon"""
+        base = self.scenario_bases.get(steps)
+        if base is None:
+            jobs = [(c, job) for c, job in self._fitted_category_jobs(steps) if job['recent_quantity'] > 0]
+            models = [job['model'] for _, job in jobs]
+            quantity = np.array([np.maximum(job['forecast'][:steps], 0) for _, job in jobs]).reshape(len(jobs), steps)
+            paths = simulate_paths(models, steps, SIMULATION_PATHS) if models else np.zeros((0, SIMULATION_PATHS, steps))
+            base = self.scenario_bases[steps] = {
+                'categories': [c for c, _ in jobs],
+                'price': np.array([job['recent_revenue'] / job['recent_quantity'] for _, job in jobs]),
+                'quantity': np.cumsum(quantity, axis=1),
+                'paths': np.cumsum(paths, axis=2, dtype=np.float32)
+            }
+        return base
+    
+    def evaluate_scenarios(self, price, volume, horizons, steps):
+        """Revenue and quantity of what-if scenarios on the fitted category forecasts, without refits
+        
+        price and volume are (scenario, category) multipliers in scenario_categories(steps) order and
+        horizons the number of periods (at most steps) each scenario covers. All scenarios are
+        read off the same cumulative forecasts and bootstrap paths as whole-array operations.
+        """
+        base = self._scenario_base(steps)
+        at = np.asarray(horizons) - 1
+        
+        # (scenario, category) quantities through each scenario's horizon, and revenue per unit sold
+        quantity = base['quantity'][:, at].T
+        unit_revenue = price * base['price']
+        revenue = unit_revenue * volume * quantity
+        baseline = (base['price'] * quantity).sum(axis=1)
+        
+        # Path revenue totals per scenario, one matrix product per distinct horizon: (scenario, path)
+        weights = unit_revenue * volume
+        path_totals = np.empty((len(at), base['paths'].shape[1]))
+        for h in np.unique(at):
+            rows = at == h
+            path_totals[rows] = weights[rows] @ base['paths'][:, :, h].astype(float)
+        lower, upper = np.quantile(path_totals, INTERVAL_QUANTILES, axis=1)
+        
+        return {
+            'revenue': revenue,
+            'quantity': volume * quantity,
+            'baseline': baseline,
+            'lower': lower,
+            'upper': upper
+        }
+    
+    def scenario_categories(self, steps):
+        return self._scenario_base(steps)['categories']
+    
     def _empty_forecast(self):
         """Empty forecast structure"""
         return {
@@ -689,36 +1647,429 @@ class SalesForecastingEngine:
         }
 
 
+# Store routing: the default store reads the preprocessor's output, others read <FORECAST_STORES_DIR>/<store>.csv
+DEFAULT_STORE = 'default'
+STORES_DIR = os.environ.get('FORECAST_STORES_DIR', 'stores')
+ARTIFACT_DIR = os.environ.get('FORECAST_ARTIFACT_DIR', 'engine_artifacts')
+ENGINE_MEMORY_BUDGET = int(float(os.environ.get('FORECAST_MEMORY_BUDGET_MB', 512)) * 2**20)
+ENGINE_IDLE_SECONDS = float(os.environ.get('FORECAST_ENGINE_IDLE_SECONDS', 1800))
+_STORE_ID = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+
+def store_data_file(store):
+    """Cleaned data file of a store, or None when the store is unknown"""
+    if store == DEFAULT_STORE:
+        return 'cleaned_customer_data.csv'
+    if not _STORE_ID.match(store):
+        return None
+    path = os.path.join(STORES_DIR, f'{store}.csv')
+    return path if os.path.exists(path) else None
+
+
+class EngineRegistry:
+    """
+    Engines keyed by (store, granularity), loaded lazily and kept in LRU order. When the
+    resident engines exceed the memory budget, or sit idle too long, they are spilled to a
+    pickled artifact and dropped; the next request reloads the artifact instead of refitting,
+    unless the store's data file has changed since.
+    
+    The registry lock only guards the bookkeeping. Loads, refits and spills run outside it,
+    and concurrent requests for a key that is still loading wait on that load alone.
+    
+    With watch_seconds set, a DataWatcher is started on first use, in whichever process
+    serves requests (the development server or each WSGI worker), never on import.
+    """
+    
+    def __init__(self, memory_budget=ENGINE_MEMORY_BUDGET, idle_seconds=ENGINE_IDLE_SECONDS,
+                 artifact_dir=ARTIFACT_DIR, watch_seconds=0):
+        self.memory_budget = memory_budget
+        self.idle_seconds = idle_seconds
+        self.artifact_dir = artifact_dir
+        self.engines = OrderedDict()
+        self.last_used = {}
+        self.lookbacks = {}
+        # Loads in flight and engines being written out, by key
+        self._loading = {}
+        self._spilling = {}
+        # Bumped whenever a store's engines are replaced, so loads that started earlier are not installed
+        self._generations = {}
+        self.watch_seconds = watch_seconds
+        self._watcher = None
+        self._lock = threading.RLock()
+    
+    def _artifact(self, key):
+        return os.path.join(self.artifact_dir, '{}-{}.pkl'.format(*key))
+    
+    def get(self, store=DEFAULT_STORE, granularity='daily'):
+        """Resident engine for a store, loading it from its artifact or data file on first use"""
+        key = (store, granularity)
+        with self._lock:
+            if self._watcher is None and self.watch_seconds > 0:
+                self._watcher = DataWatcher(self, self.watch_seconds)
+                self._watcher.start()
+            engine = self.engines.get(key)
+            if engine is None and key in self._spilling:
+                # Still being written out; put it straight back
+                engine = self.engines[key] = self._spilling[key]
+            loading = owner = None
+            if engine is None:
+                loading = self._loading.get(key)
+                if loading is None:
+                    loading = owner = self._loading[key] = Future()
+                    generation = self._generations.get(store, 0)
+        
+        if owner is not None:
+            try:
+                engine = self._load(key)
+            except BaseException as e:
+                with self._lock:
+                    self._loading.pop(key, None)
+                owner.set_exception(e)
+                raise
+            with self._lock:
+                self._loading.pop(key, None)
+                if self._generations.get(store, 0) == generation:
+                    self.engines.setdefault(key, engine)
+                engine = self.engines.get(key, engine)
+            owner.set_result(engine)
+        elif loading is not None:
+            engine = loading.result()
+        
+        with self._lock:
+            if key in self.engines:
+                self.engines.move_to_end(key)
+                self.last_used[key] = time.monotonic()
+            evicted = self._enforce_budget()
+        self._spill_all(evicted)
+        return engine
+    
+    def put(self, store, engine):
+        """Install a freshly trained engine, discarding everything held for the store"""
+        with self._lock:
+            self.discard(store)
+            self.lookbacks[store] = engine.lookback
+            key = (store, engine.granularity)
+            self.engines[key] = engine
+            self.last_used[key] = time.monotonic()
+            evicted = self._enforce_budget()
+        self._spill_all(evicted)
+    
+    def discard(self, store):
+        """Drop resident engines and artifacts of a store so every resolution reloads from its data
+        
+        Dropped engines are not closed: requests may still be using them, and their shared
+        cube is unlinked by its finalizer once the last reference goes.
+        """
+        with self._lock:
+            self._generations[store] = self._generations.get(store, 0) + 1
+            for granularity in GRANULARITIES:
+                key = (store, granularity)
+                self.engines.pop(key, None)
+                self._spilling.pop(key, None)
+                self.last_used.pop(key, None)
+                if os.path.exists(self._artifact(key)):
+                    os.remove(self._artifact(key))
+    
+    def lookback(self, store):
+        return self.lookbacks.get(store, DEFAULT_LOOKBACK)
+    
+    def _load(self, key):
+        store, granularity = key
+        data_file = store_data_file(store)
+        artifact = self._artifact(key)
+        if os.path.exists(artifact):
+            try:
+                with open(artifact, 'rb') as f:
+                    engine = pickle.load(f)
+                if engine.version == engine._model_version():
+                    return engine
+            except Exception as e:
+                print(f"Discarding unreadable engine artifact {artifact}: {e}")
+            try:
+                os.remove(artifact)
+            except FileNotFoundError:
+                pass
+        return SalesForecastingEngine(data_file, lookback=self.lookback(store), granularity=granularity)
+    
+    def _spill(self, key, engine):
+        """Persist an evicted engine (with its encoded payloads); it is freed once nothing uses it"""
+        try:
+            os.makedirs(self.artifact_dir, exist_ok=True)
+            tmp = f"{self._artifact(key)}.{threading.get_ident()}.tmp"
+            with open(tmp, 'wb') as f:
+                pickle.dump(engine, f, protocol=pickle.HIGHEST_PROTOCOL)
+            with self._lock:
+                # A discard while writing means the artifact would be stale
+                if self._spilling.get(key) is engine:
+                    os.replace(tmp, self._artifact(key))
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        except OSError as e:
+            print(f"Could not spill engine {key}: {e}")
+        finally:
+            with self._lock:
+                if self._spilling.get(key) is engine:
+                    del self._spilling[key]
+    
+    def _spill_all(self, evicted):
+        for key, engine in evicted:
+            self._spill(key, engine)
+    
+    def _evict(self, key):
+        engine = self.engines.pop(key)
+        self.last_used.pop(key, None)
+        self._spilling[key] = engine
+        return key, engine
+    
+    def _enforce_budget(self):
+        # Idle engines first, then least recently used ones until the rest fit the budget;
+        # the most recently used engine always stays resident. Called with the lock held;
+        # returns the evicted engines for the caller to spill after releasing it
+        evicted = []
+        now = time.monotonic()
+        for key in [k for k in self.engines if now - self.last_used.get(k, now) > self.idle_seconds]:
+            if key != next(reversed(self.engines)):
+                evicted.append(self._evict(key))
+        while len(self.engines) > 1 and self.memory_usage() > self.memory_budget:
+            evicted.append(self._evict(next(iter(self.engines))))
+        return evicted
+    
+    def refresh(self):
+        """Swap in refreshed engines for resident ones whose data file changed; spilled ones
+        revalidate when reloaded. Requests keep the engine they started with."""
+        with self._lock:
+            engines = list(self.engines.items())
+        for key, engine in engines:
+            try:
+                refreshed = engine.refresh()
+            except Exception as e:
+                print("Refresh of {}/{} failed: {}".format(*key, e))
+                continue
+            if refreshed is None:
+                continue
+            fresh, changed = refreshed
+            with self._lock:
+                # A retrain or eviction while refitting supersedes this refresh
+                if self.engines.get(key) is not engine:
+                    continue
+                self.engines[key] = fresh
+            print("Refreshed {}/{}: refitted {}".format(*key, ', '.join(changed) or 'main model only'))
+    
+    def memory_usage(self):
+        with self._lock:
+            return sum(engine.memory_usage() for engine in self.engines.values())
+    
+    def stats(self):
+        with self._lock:
+            return {
+                'resident': ['{}/{}'.format(*key) for key in self.engines],
+                'loading': ['{}/{}'.format(*key) for key in self._loading],
+                'memory_bytes': self.memory_usage(),
+                'memory_budget_bytes': self.memory_budget
+            }
+
+
+# Seconds between data-file checks of the watcher (0 disables it)
+WATCH_SECONDS = float(os.environ.get('FORECAST_WATCH_SECONDS', 30))
+
+
+class DataWatcher(threading.Thread):
+    """Background thread that polls the registry's data files and swaps in refreshed engines"""
+    
+    def __init__(self, registry, interval=WATCH_SECONDS):
+        super().__init__(name='forecast-data-watcher', daemon=True)
+        self.registry = registry
+        self.interval = interval
+        self._stopped = threading.Event()
+    
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            self.registry.refresh()
+    
+    def stop(self):
+        self._stopped.set()
+
+
 # Flask API
 app = Flask(__name__)
 CORS(app)
-engine = None
+registry = EngineRegistry(watch_seconds=WATCH_SECONDS)
 
-def get_engine():
-    global engine
-    if engine is None:
-        try:
-            engine = SalesForecastingEngine()
-        except Exception as e:
-            engine = SalesForecastingEngine()
-    return engine
+class UnknownStore(Exception):
+    pass
+
+@app.errorhandler(UnknownStore)
+def unknown_store(e):
+    return json_response({'error': f"Unknown store '{e}'"}, 404)
+
+def request_store():
+    store = request.args.get('store', DEFAULT_STORE)
+    if store_data_file(store) is None:
+        raise UnknownStore(store)
+    return store
+
+def request_granularity():
+    granularity = request.args.get('granularity', 'daily')
+    return granularity if granularity in GRANULARITIES else 'daily'
+
+def request_period(granularity):
+    horizons = GRANULARITIES[granularity]['horizons']
+    period = request.args.get('period', next(iter(horizons)))
+    return period if period in horizons else next(iter(horizons))
+
+def get_engine(granularity='daily', store=DEFAULT_STORE):
+    return registry.get(store, granularity)
+
+def json_response(payload, status=200):
+    """Encode a payload with the fast JSON encoder"""
+    return Response(encode_json(payload), status=status, mimetype='application/json')
+
+# Bodies smaller than this are sent uncompressed
+COMPRESS_MIN_BYTES = int(os.environ.get('FORECAST_COMPRESS_MIN_BYTES', 1024))
+CONTENT_CODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+def _compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
+
+def _etag(eng, key, encoding=None, version=None):
+    """Strong ETag of one representation of a cached payload"""
+    etag = '-'.join([version or eng.version, *map(str, key)])
+    return f"{etag}-{encoding}" if encoding else etag
+
+def _not_modified(eng, key, dated=True):
+    """ETag the client already holds for this payload, if it is current (If-None-Match wins over
+    If-Modified-Since, which only counts for dated payloads)"""
+    if request.if_none_match:
+        for encoding in (None, *CONTENT_CODINGS):
+            etag = _etag(eng, key, encoding)
+            if request.if_none_match.contains_weak(etag):
+                return etag
+        return None
+    if dated and request.if_modified_since is not None and request.if_modified_since >= eng.trained_at:
+        return _etag(eng, key)
+    return None
+
+def cached_json_response(eng, key, build, dated=True):
+    """Serve pre-encoded (and pre-compressed) bytes for identical payloads with conditional GET support
+    
+    Undated payloads (stand-ins for a better one still being built) carry no Last-Modified and
+    must be revalidated, so a client holding one never gets a 304 meant for the real payload.
+    """
+    version = eng.version
+    etag = _not_modified(eng, key, dated)
+    if etag is not None:
+        response = Response(status=304)
+    else:
+        body = eng.payload_cache.get(key)
+        if body is None:
+            body = encode_json(build())
+        # Never cache a payload under a version it was not built from
+        cache = eng.version == version
+        if cache:
+            eng.payload_cache.setdefault(key, body)
+        
+        encoding = None
+        if len(body) >= COMPRESS_MIN_BYTES:
+            encoding = next((c for c in CONTENT_CODINGS if request.accept_encodings[c]), None)
+        if encoding is not None:
+            compressed = eng.payload_cache.get(key + (encoding,))
+            if compressed is None:
+                compressed = _compress(body, encoding)
+                if cache:
+                    eng.payload_cache[key + (encoding,)] = compressed
+            body = compressed
+        
+        response = Response(body, mimetype='application/json')
+        if encoding is not None:
+            response.content_encoding = encoding
+        etag = _etag(eng, key, encoding, version)
+    
+    response.set_etag(etag)
+    if dated:
+        response.last_modified = eng.trained_at
+    else:
+        response.cache_control.no_cache = True
+    response.vary.add('Accept-Encoding')
+    return response
+
+# Latency budgets: the full pipeline runs on a build thread; if it has not finished when only the
+# reserve is left of a request's budget, the fast tier answers and the build keeps going to fill the cache
+FAST_TIER_RESERVE = float(os.environ.get('FORECAST_FAST_TIER_RESERVE_MS', 500)) / 1000
+_forecast_builds = ThreadPoolExecutor(max_workers=int(os.environ.get('FORECAST_BUILD_THREADS', 2)),
+                                      thread_name_prefix='forecast-build')
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+def request_deadline():
+    """time.monotonic() by which the request must be answered (?budget_ms=), or None for no deadline
+    
+    Call on arrival so engine loads and lock waits count against the budget.
+    """
+    try:
+        budget = float(request.args['budget_ms']) / 1000
+    except (KeyError, ValueError):
+        return None
+    return time.monotonic() + max(budget, 0.0)
+
+def _full_forecast(eng, period):
+    """Future for the encoded full forecast, joining a build already in flight"""
+    key = (id(eng), period)
+    with _inflight_lock:
+        future = _inflight.get(key)
+        if future is None:
+            def build():
+                try:
+                    version = eng.version
+                    body = encode_json(eng.generate_forecast(period))
+                    # A refresh during the build invalidates its result
+                    if eng.version == version:
+                        eng.payload_cache[('forecast', period)] = body
+                    return body
+                finally:
+                    with _inflight_lock:
+                        _inflight.pop(key, None)
+            future = _inflight[key] = _forecast_builds.submit(build)
+        return future
 
 @app.route('/api/sales/forecast', methods=['GET'])
 def get_forecast():
-    period = request.args.get('period', '7days')
-    period = '7days' if period not in ['7days', '15days'] else period
-    return jsonify(get_engine().generate_forecast(period))
-
-@app.route('/api/sales/metrics', methods=['GET'])
-def get_metrics():
-    eng = get_engine()
-    if eng.arima_model is None:
-        return jsonify({'error': 'No model'}), 404
+    deadline = request_deadline()
+    granularity = request_granularity()
+    period = request_period(granularity)
+    eng = get_engine(granularity, request_store())
+    key = ('forecast', period)
+    
+    tier = 'full'
+    cached = key in eng.payload_cache
+    if not cached and deadline is not None:
+        tier = 'fast'
+        future = _full_forecast(eng, period)
+        remaining = deadline - FAST_TIER_RESERVE - time.monotonic()
+        if remaining > 0:
+            try:
+                future.result(timeout=remaining)
+                tier = 'full'
+            except FutureTimeout:
+                pass
+            except Exception as e:
+                print(f"Full forecast failed, serving fast tier: {e}")
     
-    period = request.args.get('period', '7days')
-    forecast_days = 15 if period == '15days' else 7
+    if tier == 'fast':
+        response = cached_json_response(eng, ('forecast-fast', period), lambda: eng.generate_fast_forecast(period),
+                                        dated=False)
+    else:
+        response = cached_json_response(eng, key, lambda: eng.generate_forecast(period))
+    # The tier matches modelInfo.tier of the body; whether it was already built is reported apart
+    response.headers['X-Forecast-Tier'] = tier
+    response.headers['X-Forecast-Cache'] = 'hit' if cached else 'miss'
+    return response
+
+def _metrics_payload(eng, forecast_days):
     m = eng.arima_model.calculate_metrics(forecast_days)
-    return jsonify({
+    unit = GRANULARITIES[eng.granularity]['unit']
+    return {
         'main_model': {
             'type': f"ARIMA({eng.arima_model.p},{eng.arima_model.d},{eng.arima_model.q})",
             'mae': round(m['mae'], 2),
@@ -728,92 +2079,255 @@ def get_metrics():
             'rmse_normalized': round(m['rmse_normalized'], 4),
             'mean_actual': round(m['mean_actual'], 2),
             'accuracy': f"{round(max(0, 100 - m['mape']), 1)}%",
-            'forecast_period': f"{forecast_days}days",
+            'forecast_period': f"{forecast_days}{unit}",
+            'granularity': eng.granularity,
             'train_size': m.get('train_size', 0),
             'test_size': m.get('test_size', 0),
             'mae_percent': f"{round(m.get('mae_normalized', 0) * 100, 1)}%",
             'rmse_percent': f"{round(m.get('rmse_normalized', 0) * 100, 1)}%",
             'mape_percent': f"{round(m['mape'], 1)}%"
         },
-        'data_points': len(eng.daily_sales) if eng.daily_sales is not None else 0,
+        'data_points': eng.n_periods,
         'category_models': len(eng.category_models)
-    })
+    }
 
-@app.route('/api/sales/categories', methods=['GET'])
-def get_categories():
-    eng = get_engine()
-    period = request.args.get('period', '7days')
-    steps = 7 if period == '7days' else 15
-    
-    if eng.daily_sales is None or len(eng.daily_sales) == 0:
-        return jsonify({'error': 'No data available'}), 404
+@app.route('/api/sales/metrics', methods=['GET'])
+def get_metrics():
+    granularity = request_granularity()
+    eng = get_engine(granularity, request_store())
+    if eng.arima_model is None:
+        return json_response({'error': 'No model'}, 404)
     
-    last_date = eng.daily_sales['Date'].max()
+    forecast_days = eng.horizon_steps(request_period(granularity))
+    return cached_json_response(eng, ('metrics', forecast_days), lambda: _metrics_payload(eng, forecast_days))
+
+def _categories_payload(eng, period, steps):
+    last_date = eng.last_date
     
     # Calculate train-test split for consistency
-    test_size = max(int(len(eng.daily_sales) * 0.25), steps)
-    test_size = min(test_size, len(eng.daily_sales) // 3)
-    train_size = len(eng.daily_sales) - test_size
+    test_size = max(int(eng.n_periods * 0.25), steps)
+    test_size = min(test_size, eng.n_periods // 3)
+    train_size = eng.n_periods - test_size
     
-    categories = eng._category_forecast(steps, last_date, train_size, test_size)
+    errors = []
+    categories = eng._category_forecast(steps, last_date, train_size, test_size, errors)
     
-    return jsonify({
+    return {
         'categories': categories,
+        'errors': errors,
         'period': period,
         'forecast_steps': steps,
+        'granularity': eng.granularity,
         'total_categories': len(categories)
-    })
+    }
 
-@app.route('/api/sales/data-status', methods=['GET'])
-def get_status():
-    eng = get_engine()
-    available = eng.df is not None and not eng.df.empty
+@app.route('/api/sales/categories', methods=['GET'])
+def get_categories():
+    granularity = request_granularity()
+    eng = get_engine(granularity, request_store())
+    period = request_period(granularity)
+    steps = eng.horizon_steps(period)
+    
+    if eng.n_periods == 0:
+        return json_response({'error': 'No data available'}, 404)
+    
+    return cached_json_response(eng, ('categories', period), lambda: _categories_payload(eng, period, steps))
+
+def _status_payload(eng):
+    available = eng.record_count > 0
     
     cat_info = {}
-    for cat, data in eng.category_sales.items():
-        cat_info[cat] = {
-            'data_points': len(data),
-            'total_quantity': int(data['Quantity'].sum()),
-            'total_revenue': round(data['Revenue'].sum(), 2),
-            'has_model': cat in eng.category_models
-        }
+    if eng.cube is not None:
+        totals = eng.cube[:, [REVENUE, QUANTITY]].sum(axis=2, dtype=float)
+        for cat, row in eng.category_rows.items():
+            cat_info[cat] = {
+                'data_points': eng.n_periods,
+                'total_quantity': int(round(totals[row, 1])),
+                'total_revenue': round(float(totals[row, 0]), 2),
+                'has_model': cat in eng.category_models
+            }
     
-    return jsonify({
+    return {
         'status': 'success',
         'data_available': available,
-        'record_count': len(eng.df) if available else 0,
-        'daily_points': len(eng.daily_sales) if eng.daily_sales is not None else 0,
+        'record_count': eng.record_count,
+        'daily_points': eng.n_periods,
+        'granularity': eng.granularity,
+        'lookback_days': eng.lookback_days,
         'models_trained': eng.arima_model is not None,
         'category_models': len(eng.category_models),
         'categories': cat_info
+    }
+
+@app.route('/api/sales/data-status', methods=['GET'])
+def get_status():
+    eng = get_engine(request_granularity(), request_store())
+    return cached_json_response(eng, ('data-status',), lambda: _status_payload(eng))
+
+@app.route('/api/sales/backtest', methods=['GET'])
+def get_backtest():
+    granularity = request_granularity()
+    eng = get_engine(granularity, request_store())
+    period = request_period(granularity)
+    try:
+        n_origins = int(request.args.get('origins', BACKTEST_ORIGINS))
+        step = int(request.args['step']) if 'step' in request.args else None
+    except ValueError:
+        return json_response({'error': 'origins and step must be integers'}, 400)
+    if not 1 <= n_origins <= 52 or (step is not None and step < 1):
+        return json_response({'error': 'origins must be between 1 and 52 and step positive'}, 400)
+    
+    return cached_json_response(eng, ('backtest', period, n_origins, step),
+                                lambda: {**eng.backtest(period, n_origins, step), 'period': period})
+
+MAX_SCENARIOS = 1000
+
+def _multipliers(scenarios, field, categories):
+    """(scenario, category) matrix from per-scenario {category: multiplier} maps; '*' sets the default"""
+    matrix = np.ones((len(scenarios), len(categories)))
+    column = {c: i for i, c in enumerate(categories)}
+    for row, scenario in enumerate(scenarios):
+        factors = scenario.get(field) or {}
+        if not isinstance(factors, dict):
+            raise ValueError(f"scenario {row}: '{field}' must map categories to multipliers")
+        if '*' in factors:
+            matrix[row] = factors['*']
+        for category, factor in factors.items():
+            if category == '*':
+                continue
+            if category not in column:
+                raise ValueError(f"scenario {row}: unknown category '{category}'")
+            matrix[row, column[category]] = factor
+    if not np.all(np.isfinite(matrix)) or np.any(matrix < 0):
+        raise ValueError(f"'{field}' multipliers must be non-negative numbers")
+    return matrix
+
+@app.route('/api/sales/scenarios', methods=['POST'])
+def what_if_scenarios():
+    """What-if revenue for many scenarios of per-category price/volume multipliers and horizons"""
+    granularity = request_granularity()
+    eng = get_engine(granularity, request_store())
+    default_steps = eng.horizon_steps(request_period(granularity))
+    max_steps = max(GRANULARITIES[granularity]['horizons'].values())
+    
+    body = request.get_json(silent=True) or {}
+    scenarios = body.get('scenarios')
+    if not isinstance(scenarios, list) or not 1 <= len(scenarios) <= MAX_SCENARIOS:
+        return json_response({'error': f"'scenarios' must be a list of 1 to {MAX_SCENARIOS} scenarios"}, 400)
+    if not eng.category_models:
+        return json_response({'error': 'No category models'}, 404)
+    
+    try:
+        if not all(isinstance(scenario, dict) for scenario in scenarios):
+            raise ValueError('each scenario must be an object')
+        horizons = np.array([scenario.get('horizon', default_steps) for scenario in scenarios])
+        if horizons.dtype.kind not in 'iu' or horizons.min() < 1 or horizons.max() > max_steps:
+            raise ValueError(f"'horizon' must be a whole number of periods between 1 and {max_steps}")
+        steps = int(horizons.max())
+        categories = eng.scenario_categories(steps)
+        price = _multipliers(scenarios, 'price', categories)
+        volume = _multipliers(scenarios, 'volume', categories)
+    except (ValueError, TypeError) as e:
+        return json_response({'error': str(e)}, 400)
+    
+    result = eng.evaluate_scenarios(price, volume, horizons, steps)
+    revenue = np.round(result['revenue'], 2)
+    quantity = np.round(result['quantity'], 0)
+    totals = result['revenue'].sum(axis=1)
+    change = np.where(result['baseline'] > 0, (totals / np.where(result['baseline'] > 0, result['baseline'], 1) - 1) * 100, 0.0)
+    
+    return json_response({
+        'scenarios': [{
+            'name': scenario.get('name', f'Scenario {i + 1}'),
+            'horizon': int(horizons[i]),
+            'revenue': round(float(totals[i]), 2),
+            'revenueLower': round(float(result['lower'][i]), 2),
+            'revenueUpper': round(float(result['upper'][i]), 2),
+            'baselineRevenue': round(float(result['baseline'][i]), 2),
+            'changePercent': round(float(change[i]), 1),
+            'quantity': int(quantity[i].sum()),
+            'categories': [{'category': c, 'revenue': r, 'quantity': int(q)}
+                           for c, r, q in zip(categories, revenue[i].tolist(), quantity[i].tolist())]
+        } for i, scenario in enumerate(scenarios)],
+        'intervalLevel': INTERVAL_LEVEL,
+        'granularity': granularity
     })
 
 @app.route('/api/sales/retrain', methods=['POST'])
 def retrain():
-    global engine
-    engine = SalesForecastingEngine()
+    granularity = request_granularity()
+    store = request_store()
+    lookback = request.args.get('lookback', registry.lookback(store))
+    try:
+        lookback = parse_lookback(lookback, granularity)
+    except ValueError as e:
+        return json_response({'status': 'error', 'message': str(e)}, 400)
+    engine = SalesForecastingEngine(store_data_file(store), lookback=lookback, granularity=granularity)
+    
+    # The store's engines at other resolutions reload lazily from the fresh data
+    registry.put(store, engine)
     
-    return jsonify({
+    return json_response({
         'status': 'success',
         'message': 'Retrained',
         'main_model': engine.arima_model is not None,
         'category_models': len(engine.category_models),
-        'categories': list(engine.category_models.keys())
+        'categories': list(engine.category_models.keys()),
+        'lookback_days': engine.lookback_days,
+        'granularity': granularity,
+        'store': store
     })
 
 @app.route('/health', methods=['GET'])
 def health():
     eng = get_engine()
-    return jsonify({
+    return json_response({
         'status': 'healthy',
         'engine': 'Enhanced ARIMA Engine with MAPE',
         'timestamp': datetime.now().isoformat(),
         'models': {
             'main': eng.arima_model is not None,
             'categories': len(eng.category_models),
-            'data_loaded': eng.df is not None and not eng.df.empty
-        }
+            'data_loaded': eng.record_count > 0
+        },
+        'engines': registry.stats()
     })
 
+def backtest_cli(argv):
+    """python forcastingengine.py backtest [--period 7days] [--origins 8] [--step N] ..."""
+    import argparse
+    parser = argparse.ArgumentParser(prog='forcastingengine.py backtest',
+                                     description='Rolling-origin backtest of the selected ARIMA models')
+    parser.add_argument('--data-file', default='cleaned_customer_data.csv')
+    parser.add_argument('--granularity', choices=list(GRANULARITIES), default='daily')
+    parser.add_argument('--lookback', type=parse_lookback, default=DEFAULT_LOOKBACK,
+                        help="training window in days, 'auto' or 'all'")
+    parser.add_argument('--period', default=None, help='forecast horizon, e.g. 7days (default: shortest)')
+    parser.add_argument('--origins', type=int, default=BACKTEST_ORIGINS)
+    parser.add_argument('--step', type=int, default=None, help='periods between origins (default: horizon)')
+    parser.add_argument('--json', action='store_true', help='print the result as JSON')
+    args = parser.parse_args(argv)
+    
+    eng = SalesForecastingEngine(args.data_file, lookback=args.lookback, granularity=args.granularity)
+    result = eng.backtest(args.period, args.origins, args.step)
+    if args.json:
+        print(encode_json(result).decode())
+        return
+    if not result['series']:
+        print(result['error'])
+        return
+    
+    print(f"\nBacktest: {len(result['origins'])} origins from {result['origins'][0]} to {result['origins'][-1]}, "
+          f"{result['forecastSteps']} {GRANULARITIES[eng.granularity]['unit']} ahead")
+    print(f"{'Series':<16}{'Model':<14}{'MAE':>12}{'RMSE':>12}{'MAPE':>9}")
+    for row in result['series']:
+        print(f"{row['name']:<16}{row['model']:<14}{row['mae']:>12,.2f}{row['rmse']:>12,.2f}{row['mape']:>8.1f}%")
+    for error in result['errors']:
+        print(f"  {error['category']}: {error['error']}")
+
 if __name__ == '__main__':
-    app.run(debug=False, host='0.0.0.0', port=5001)
\ No newline at end of file
+    import sys
+    if len(sys.argv) > 1 and sys.argv[1] == 'backtest':
+        backtest_cli(sys.argv[2:])
+    else:
+        app.run(debug=False, host='0.0.0.0', port=5001)
\ No newline at end of file
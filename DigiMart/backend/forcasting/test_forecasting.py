@@ -0,0 +1,258 @@
+"""Equivalence checks for the forecasting engine and the data preprocessor
+
+Run from this directory with: python -m pytest -q
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import datapreprocess as dp
+import forcastingengine as fe
+
+SAMPLE_DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cleaned_customer_data.csv')
+CATEGORIES = ['Laptop', 'Smartphone', 'Tablet', 'Headphones']
+
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    """Keep order-store and artifact files out of the working tree and jobs in-process"""
+    monkeypatch.setattr(fe, 'order_store', fe.OrderStore(str(tmp_path / 'arima_orders.json')))
+    monkeypatch.setattr(fe, 'FORECAST_WORKERS', 1)
+
+
+def synthetic_orders(path, n_days, blank_categories=0, seed=0):
+    """Cleaned-format orders over n_days with missing days and optionally rows without a category"""
+    rng = np.random.default_rng(seed)
+    days = pd.date_range('2024-01-01', periods=n_days, freq='D')
+    # Keep both ends so the history spans exactly n_days
+    days = days[np.r_[True, rng.random(n_days - 2) > 0.05, True]]
+    n = len(days) * 6
+    df = pd.DataFrame({
+        'Date': np.repeat(days, 6).strftime('%Y-%m-%d'),
+        'Product_Type': rng.choice(CATEGORIES, n),
+        'Revenue': np.round(rng.gamma(4.0, 150.0, n), 2),
+        'Quantity': rng.integers(1, 6, n)
+    })
+    df.loc[rng.choice(n, blank_categories, replace=False), 'Product_Type'] = np.nan
+    df.to_csv(path, index=False)
+    return df
+
+
+def daily_frame(df, category=None):
+    """Daily sums of a cleaned frame over the full date range, as the pandas implementation built them"""
+    if category is not None:
+        df = df[df['Product_Type'] == category]
+    daily = df.assign(Date=pd.to_datetime(df['Date'])).groupby('Date')[['Revenue', 'Quantity']].sum()
+    return daily.reindex(pd.date_range(daily.index.min(), daily.index.max(), freq='D'), fill_value=0)
+
+
+# Series cube
+
+@pytest.mark.parametrize('n_days,lookback', [(365, None), (365, 91), (366, None), (366, 365)])
+def test_cube_matches_pandas_aggregates(tmp_path, n_days, lookback):
+    df = synthetic_orders(tmp_path / 'orders.csv', n_days, blank_categories=17)
+    eng = fe.SalesForecastingEngine(str(tmp_path / 'orders.csv'), lookback=lookback, fit=False)
+
+    assert eng.cube is not None
+    window = lookback or n_days
+    assert eng.n_periods == window
+
+    # Total sales include rows without a category
+    total = daily_frame(df).iloc[-window:]
+    np.testing.assert_allclose(eng.series(fe.REVENUE), total['Revenue'], rtol=1e-6)
+    np.testing.assert_allclose(eng.series(fe.QUANTITY), total['Quantity'], rtol=1e-6)
+    np.testing.assert_allclose(eng.series(fe.REVENUE_SMOOTHED),
+                               total['Revenue'].rolling(3, center=True, min_periods=1).mean(), rtol=1e-6)
+
+    assert sorted(eng.category_rows) == sorted(CATEGORIES)
+    full_range = daily_frame(df).index[-window:]
+    for category in CATEGORIES:
+        expected = daily_frame(df, category).reindex(full_range, fill_value=0)
+        np.testing.assert_allclose(eng.series(fe.QUANTITY, category), expected['Quantity'], rtol=1e-6)
+        np.testing.assert_allclose(eng.series(fe.QUANTITY_SMOOTHED, category),
+                                   expected['Quantity'].rolling(3, center=True, min_periods=1).mean(), rtol=1e-6)
+
+
+def test_unreadable_cube_errors_are_not_hidden(tmp_path):
+    pd.DataFrame({'Date': ['2024-01-01'], 'Product_Type': ['Laptop'], 'Revenue': ['abc'],
+                  'Quantity': [1]}).to_csv(tmp_path / 'bad.csv', index=False)
+    with pytest.raises(ValueError):
+        fe.SalesForecastingEngine(str(tmp_path / 'bad.csv'))
+    assert fe.SalesForecastingEngine(str(tmp_path / 'missing.csv')).cube is None
+
+
+def test_float32_cube_forecasts_match_float64_history():
+    eng = fe.SalesForecastingEngine(SAMPLE_DATA)
+    daily = daily_frame(pd.read_csv(SAMPLE_DATA))
+    history = daily['Revenue'].rolling(3, center=True, min_periods=1).mean().to_numpy()
+
+    main = eng.arima_model
+    reference = fe.EnhancedARIMAModel(main.p, main.d, main.q, period=eng.season).fit(history)
+    np.testing.assert_allclose(main.forecast(15), reference.forecast(15), rtol=1e-4)
+
+
+# AR estimation
+
+def test_fft_autocorrelation_matches_direct_sums():
+    rng = np.random.default_rng(1)
+    data = rng.normal(size=200).cumsum()
+    model = fe.EnhancedARIMAModel()
+
+    centered = data - data.mean()
+    direct = np.array([centered[:len(data) - k] @ centered[k:] for k in range(11)]) / (centered @ centered)
+    np.testing.assert_allclose(model.autocorrelation(data, 10), direct, atol=1e-12)
+
+
+@pytest.mark.parametrize('p', [1, 2, 5, 14])
+def test_levinson_durbin_matches_dense_yule_walker_solve(p):
+    rng = np.random.default_rng(p)
+    data = rng.normal(size=500)
+    for _ in range(2):
+        data = data + 0.6 * np.roll(data, 1)
+    autocorr = fe.EnhancedARIMAModel().autocorrelation(data, p)
+
+    ridge = 1e-6
+    toeplitz = autocorr[np.abs(np.subtract.outer(np.arange(p), np.arange(p)))] + ridge * np.eye(p)
+    dense = np.linalg.solve(toeplitz, autocorr[1:p + 1])
+    np.testing.assert_allclose(fe.EnhancedARIMAModel.levinson_durbin(autocorr, p, ridge), dense, rtol=1e-8, atol=1e-10)
+
+
+# Preprocessing
+
+def raw_orders(path, seed=2):
+    """Raw export rows with every kind of row the cleaning stages drop or normalize"""
+    rng = np.random.default_rng(seed)
+    n = 400
+    df = pd.DataFrame({
+        'Customer ID': rng.integers(1000, 1100, n),
+        'Product Type': rng.choice(['Laptop', ' tablet', 'SMARTPHONE ', 'Headphones', None], n),
+        'Order Status': rng.choice(['Completed', 'completed ', 'Cancelled', ' COMPLETED'], n),
+        'Total Price': rng.choice(['12.5', '-3', 'abc', '999.99', '250'], n),
+        'Quantity': rng.choice(['1', '0', '2', 'x', '4'], n),
+        # Few distinct dates, so rows with equal timestamps have to keep their order
+        'Purchase Date': rng.choice(['2024-03-01', '2024-02-29', 'not a date', '2024-03-05', '2024-01-15'], n)
+    })
+    df.to_csv(path, index=False)
+
+
+def cleaned(input_file, fused):
+    return (dp.DataPreprocessor(str(input_file), verbose=False, fused=fused)
+            .load_data()
+            .validate_required_columns()
+            .clean()
+            .select_final_columns()
+            .df)
+
+
+def test_fused_cleaning_matches_stage_chain(tmp_path):
+    raw_orders(tmp_path / 'raw.csv')
+    chained = cleaned(tmp_path / 'raw.csv', fused=False).reset_index(drop=True)
+    fused = cleaned(tmp_path / 'raw.csv', fused=True)
+
+    assert len(fused) > 0
+    pd.testing.assert_frame_equal(fused, chained)
+
+
+def test_partition_summaries_merge_to_the_whole(tmp_path):
+    raw_orders(tmp_path / 'raw.csv')
+    df = cleaned(tmp_path / 'raw.csv', fused=True)
+    whole = dp.summarize_cleaned(df)
+    merged = dp.merge_summaries([dp.summarize_cleaned(df.iloc[:150]), dp.summarize_cleaned(df.iloc[150:])])
+
+    assert merged['rows'] == whole['rows']
+    assert merged['revenue'] == pytest.approx(whole['revenue'])
+    assert merged['daily'].keys() == whole['daily'].keys()
+    for date, values in whole['daily'].items():
+        assert merged['daily'][date] == pytest.approx(values)
+
+
+# Lookback and resolution
+
+def test_weekly_lookback_keeps_enough_periods_to_fit():
+    eng = fe.SalesForecastingEngine(SAMPLE_DATA, lookback=60, granularity='weekly')
+    assert eng.n_periods == fe.MIN_LOOKBACK_PERIODS
+    assert eng.arima_model is not None and eng.category_models
+    assert eng.lookback_days == fe.MIN_LOOKBACK_PERIODS * 7
+
+    with pytest.raises(ValueError):
+        fe.parse_lookback('60', 'weekly')
+    with pytest.raises(ValueError):
+        fe.parse_lookback('abc')
+
+
+def test_lookback_days_reports_the_history_kept():
+    eng = fe.SalesForecastingEngine(SAMPLE_DATA, lookback=400, fit=False)
+    assert eng.lookback_days == eng.n_periods == 366
+
+
+def test_average_price_window_spans_14_days_at_every_resolution():
+    for granularity, periods in (('daily', 14), ('weekly', 2), ('monthly', 1)):
+        assert fe.SalesForecastingEngine(SAMPLE_DATA, granularity=granularity, fit=False).recent_periods == periods
+
+    eng = fe.SalesForecastingEngine(SAMPLE_DATA, granularity='weekly')
+    for category, job in eng._fitted_category_jobs(4):
+        block = eng.cube[eng.category_rows[category]]
+        assert job['recent_revenue'] == pytest.approx(float(block[fe.REVENUE, -2:].sum(dtype=float)))
+
+
+# Refresh, registry and scenarios
+
+def test_append_refits_only_categories_with_new_sales(tmp_path):
+    df = synthetic_orders(tmp_path / 'all.csv', 120)
+    last = df['Date'].max()
+    path = str(tmp_path / 'orders.csv')
+    df[df['Date'] < last].to_csv(path, index=False)
+    eng = fe.SalesForecastingEngine(path)
+
+    appended = df[(df['Date'] < last) | (df['Product_Type'] != 'Tablet')]
+    appended.to_csv(path, index=False)
+    os.utime(path, ns=(os.stat(path).st_mtime_ns + 10**9,) * 2)
+    fresh, changed = eng.refresh()
+
+    assert fresh is not eng and eng.n_periods == 119 and fresh.n_periods == 120
+    sold = set(df.loc[(df['Date'] == last) & (df['Product_Type'] != 'Tablet'), 'Product_Type'])
+    assert set(changed) == sold
+    scratch = fe.SalesForecastingEngine(path)
+    for category in changed:
+        # A refit can be rejected on its metrics, but it must be rejected the same way as a full fit
+        assert (category in fresh.category_models) == (category in scratch.category_models)
+        if category not in scratch.category_models:
+            continue
+        np.testing.assert_array_equal(fresh.category_models[category].forecast(7),
+                                      scratch.category_models[category].forecast(7))
+
+
+def test_spilled_engine_reloads_with_identical_forecasts(tmp_path, monkeypatch):
+    stores = tmp_path / 'stores'
+    stores.mkdir()
+    synthetic_orders(stores / 'north.csv', 90, seed=3)
+    synthetic_orders(stores / 'south.csv', 90, seed=4)
+    monkeypatch.setattr(fe, 'STORES_DIR', str(stores))
+    registry = fe.EngineRegistry(memory_budget=1, artifact_dir=str(tmp_path / 'artifacts'))
+
+    north = registry.get('north')
+    expected = north.generate_forecast('7days')
+    registry.get('south')
+    assert registry.stats()['resident'] == ['south/daily']
+    assert os.path.exists(registry._artifact(('north', 'daily')))
+
+    reloaded = registry.get('north')
+    assert reloaded is not north
+    assert reloaded.version == north.version
+    assert reloaded.generate_forecast('7days') == expected
+
+
+def test_unchanged_scenario_reproduces_fitted_category_revenue():
+    eng = fe.SalesForecastingEngine(SAMPLE_DATA)
+    steps = 7
+    categories = eng.scenario_categories(steps)
+    ones = np.ones((2, len(categories)))
+    result = eng.evaluate_scenarios(ones, ones * [[1.0]] * np.array([[1.0], [2.0]]), np.array([steps, steps]), steps)
+
+    expected = sum(np.maximum(job['forecast'][:steps], 0).sum() * job['recent_revenue'] / job['recent_quantity']
+                   for _, job in eng._fitted_category_jobs(steps) if job['recent_quantity'] > 0)
+    assert result['revenue'][0].sum() == pytest.approx(expected)
+    assert result['revenue'][1].sum() == pytest.approx(2 * expected)
+    assert result['lower'][0] <= result['revenue'][0].sum() <= result['upper'][0]